@@ -0,0 +1,747 @@
+import bisect
+import datetime
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from mysql.connector import Error
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+from decouple import config
+
+from esquema import COLACION_INDICE, crear_tablas
+from metricas import METRICAS, medido
+from modelos import CAMPOS_ACTUALIZABLES, TASA_DESCUENTO_ONLINE, UNIDADES_BENEFICIO, Venta, VentaLocal, VentaOnline
+
+logger = logging.getLogger(__name__)
+
+# sqlite3 ya no adapta datetime.date por defecto; se guarda en formato ISO
+# igual que lo devuelve MySQL al convertirlo a texto.
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+
+CONSULTA_VENTAS = '''
+    SELECT v.dni, v.fecha, v.cliente, v.producto_vendido,
+           o.dni IS NOT NULL AS es_online, o.descuento_efectivo,
+           l.dni IS NOT NULL AS es_local, l.envio_gratis
+    FROM Venta v
+    LEFT JOIN VentaOnline o ON o.dni = v.dni
+    LEFT JOIN VentaLocal l ON l.dni = v.dni
+'''
+
+def venta_desde_fila(fila, incluir_sin_tipo=False):
+    datos = (fila['dni'], fila['fecha'], fila['cliente'], fila['producto_vendido'])
+    if fila['es_online']:
+        descuento = fila['descuento_efectivo']
+        return VentaOnline.desde_db(*datos, descuento_efectivo=None if descuento is None else float(descuento))
+    if fila['es_local']:
+        envio = fila['envio_gratis']
+        return VentaLocal.desde_db(*datos, envio_gratis=None if envio is None else bool(envio))
+    if incluir_sin_tipo:
+        # Fila de Venta sin su fila en VentaOnline ni VentaLocal: los listados
+        # la muestran con los datos comunes.
+        return Venta.desde_db(*datos)
+    return None
+
+
+def venta_desde_registro(registro):
+    datos = (int(registro['dni']), registro['fecha'], registro['cliente'], int(registro['producto_vendido']))
+    if 'descuento_efectivo' in registro:
+        return VentaOnline.desde_db(*datos, descuento_efectivo=registro['descuento_efectivo'])
+    return VentaLocal.desde_db(*datos, envio_gratis=registro.get('envio_gratis'))
+
+
+def sentencias_insercion(ventas):
+    # executemany agrupa los INSERT en una única sentencia de múltiples filas.
+    if not ventas:
+        return []
+    sentencias = [('''
+        INSERT INTO Venta (dni, fecha, cliente, producto_vendido)
+        VALUES (%s, %s, %s, %s)
+    ''', [(v.dni, v.fecha, v.cliente, v.producto_vendido) for v in ventas])]
+
+    online = [(v.dni, v.fecha, v.cliente, v.producto_vendido, v.descuento_efectivo) for v in ventas if isinstance(v, VentaOnline)]
+    if online:
+        sentencias.append(('''
+            INSERT INTO VentaOnline (dni, fecha, cliente, producto_vendido, descuento_efectivo)
+            VALUES (%s, %s, %s, %s, %s)
+        ''', online))
+
+    local = [(v.dni, v.fecha, v.cliente, v.producto_vendido, v.envio_gratis) for v in ventas if isinstance(v, VentaLocal)]
+    if local:
+        sentencias.append(('''
+            INSERT INTO VentaLocal (dni, fecha, cliente, producto_vendido, envio_gratis)
+            VALUES (%s, %s, %s, %s, %s)
+        ''', local))
+    return sentencias
+
+
+def _caso_por_dni(valores):
+    # CASE dni WHEN ... THEN ... END: un valor distinto por venta en una sola sentencia.
+    caso = 'CASE dni ' + ' '.join(['WHEN %s THEN %s'] * len(valores)) + ' END'
+    return caso, [dato for par in valores.items() for dato in par]
+
+
+def sentencias_actualizacion(cambios):
+    # cambios: {dni: {campo: valor}} ya validados. Devuelve un UPDATE por campo
+    # y tabla; las copias de Venta en las subtablas se mantienen al día y al
+    # cambiar producto_vendido se recalculan los campos derivados.
+    por_campo = {}
+    for dni, campos in cambios.items():
+        for campo, valor in campos.items():
+            por_campo.setdefault(campo, {})[dni] = valor
+
+    sentencias = []
+    for campo in ('producto_vendido', 'fecha', 'cliente'):
+        valores = por_campo.get(campo)
+        if not valores:
+            continue
+        caso, parametros = _caso_por_dni(valores)
+        dnis = list(valores)
+        filtro = 'WHERE dni IN (' + ', '.join(['%s'] * len(dnis)) + ')'
+        sentencias.append((f'UPDATE Venta SET {campo} = {caso} {filtro}', parametros + dnis))
+        if campo == 'producto_vendido':
+            sentencias.append((
+                f'UPDATE VentaOnline SET producto_vendido = {caso}, '
+                f'descuento_efectivo = CASE WHEN {caso} > %s THEN {caso} * %s ELSE 0 END {filtro}',
+                parametros + parametros + [UNIDADES_BENEFICIO] + parametros + [TASA_DESCUENTO_ONLINE] + dnis,
+            ))
+            sentencias.append((
+                f'UPDATE VentaLocal SET producto_vendido = {caso}, envio_gratis = ({caso}) > %s {filtro}',
+                parametros + parametros + [UNIDADES_BENEFICIO] + dnis,
+            ))
+        else:
+            for tabla in ('VentaOnline', 'VentaLocal'):
+                sentencias.append((f'UPDATE {tabla} SET {campo} = {caso} {filtro}', parametros + dnis))
+
+    # Los valores explícitos de los derivados se aplican al final y prevalecen
+    # sobre el recálculo.
+    for campo in ('descuento_efectivo', 'envio_gratis'):
+        valores = por_campo.get(campo)
+        if not valores:
+            continue
+        caso, parametros = _caso_por_dni(valores)
+        dnis = list(valores)
+        filtro = 'WHERE dni IN (' + ', '.join(['%s'] * len(dnis)) + ')'
+        sentencias.append((f'UPDATE {CAMPOS_ACTUALIZABLES[campo]} SET {campo} = {caso} {filtro}', parametros + dnis))
+    return sentencias
+
+
+def aplicar_cambios(venta, campos):
+    # Versión en memoria de sentencias_actualizacion para una venta.
+    datos = {'dni': venta.dni, 'fecha': venta.fecha, 'cliente': venta.cliente, 'producto_vendido': venta.producto_vendido}
+    datos.update((campo, valor) for campo, valor in campos.items() if campo in datos)
+    recalcular = 'producto_vendido' in campos
+    if isinstance(venta, VentaOnline):
+        descuento = campos.get('descuento_efectivo', None if recalcular else venta.descuento_efectivo)
+        return VentaOnline.desde_db(**datos, descuento_efectivo=descuento)
+    envio = campos.get('envio_gratis', None if recalcular else venta.envio_gratis)
+    return VentaLocal.desde_db(**datos, envio_gratis=envio)
+
+
+def orden_busqueda(cliente_prefijo, desde, hasta):
+    # Las búsquedas recorren el índice de su filtro principal (cliente o
+    # fecha) en orden, así cada página se lee sin ordenar todas las coincidencias.
+    if cliente_prefijo:
+        return 'cliente'
+    if desde is not None or hasta is not None:
+        return 'fecha'
+    return 'dni'
+
+
+def clave_busqueda(venta, orden):
+    # Cursor de paginación: posición de la venta en el orden de la búsqueda.
+    return (getattr(venta, orden), venta.dni)
+
+
+def patron_prefijo(prefijo):
+    # '!' como carácter de escape funciona igual en MySQL y SQLite.
+    return prefijo.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+
+def coincide_busqueda(venta, cliente_prefijo, desde, hasta, tipo):
+    if cliente_prefijo and not venta.cliente.lower().startswith(cliente_prefijo.lower()):
+        return False
+    if desde is not None and venta.fecha < desde:
+        return False
+    if hasta is not None and venta.fecha > hasta:
+        return False
+    if tipo is not None and isinstance(venta, VentaOnline) != (tipo == 'online'):
+        return False
+    return True
+
+
+def es_json_lines(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        primera_linea = archivo.readline().strip()
+    try:
+        return 'dni' in json.loads(primera_linea)
+    except ValueError:
+        return False
+
+
+def leer_registros_json(ruta):
+    # Acepta tanto el formato de ventas_db.json (un objeto indexado por DNI)
+    # como JSON lines (un registro por línea, leído sin cargar el archivo).
+    json_lines = es_json_lines(ruta)
+    with open(ruta, encoding='utf-8') as archivo:
+        if not json_lines:
+            contenido = archivo.read().strip()
+            if contenido:
+                yield from json.loads(contenido).values()
+            return
+        for linea in archivo:
+            linea = linea.strip()
+            if linea:
+                yield json.loads(linea)
+
+
+class BackendVentas:
+    # Interfaz común de almacenamiento. Las operaciones de escritura son
+    # atómicas por llamada y las lecturas devuelven objetos ya hidratados.
+    metricas = METRICAS
+    # Dialecto SQL del esquema (ver esquema.py); None si no hay tablas.
+    dialecto = None
+
+    def connect(self):
+        return None
+
+    def liberar(self, connection):
+        pass
+
+    def estadisticas_pool(self):
+        return None
+
+    def existentes(self, dnis):
+        raise NotImplementedError
+
+    def insertar_lote(self, lote):
+        # lote: lista de (indice, venta). Devuelve (dnis insertados, errores).
+        raise NotImplementedError
+
+    def obtener(self, dnis):
+        raise NotImplementedError
+
+    def iterar(self, tamano_pagina):
+        raise NotImplementedError
+
+    def buscar(self, cliente_prefijo, desde, hasta, tipo, limite, despues_de=None):
+        # Devuelve hasta `limite` ventas en el orden de orden_busqueda, a
+        # partir del cursor despues_de (ver clave_busqueda).
+        raise NotImplementedError
+
+    def actualizar_lote(self, cambios, tamano_lote, verificar=True):
+        # cambios: {dni: {campo: valor}}. Aplica todo o nada y devuelve el
+        # conjunto de DNI actualizados.
+        raise NotImplementedError
+
+    def eliminar(self, dni):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+
+class BackendSQL(BackendVentas):
+    # Implementación compartida por los motores SQL. Las consultas se escriben
+    # con marcadores %s y se adaptan al estilo de parámetros de cada driver.
+    marcador = '%s'
+    dialecto = 'mysql'
+
+    def _sql(self, query):
+        if self.marcador != '%s':
+            return query.replace('%s', self.marcador)
+        return query
+
+    def cursor(self, connection, diccionario=False):
+        return connection.cursor(dictionary=diccionario)
+
+    def _conexion(self):
+        connection = self.connect()
+        if not connection:
+            raise ConnectionError('Sin conexión a la base de datos')
+        return connection
+
+    # Toda sentencia pasa por ejecutar/consultar/ejecutar_varios, que miden
+    # su duración y las filas afectadas o devueltas.
+    def ejecutar(self, cursor, query, parametros=()):
+        inicio = time.perf_counter()
+        cursor.execute(self._sql(query), parametros)
+        self.metricas.registrar_consulta(query, time.perf_counter() - inicio, cursor.rowcount)
+        return cursor
+
+    def consultar(self, cursor, query, parametros=()):
+        inicio = time.perf_counter()
+        cursor.execute(self._sql(query), parametros)
+        filas = cursor.fetchall()
+        self.metricas.registrar_consulta(query, time.perf_counter() - inicio, len(filas))
+        return filas
+
+    def ejecutar_varios(self, cursor, query, filas):
+        inicio = time.perf_counter()
+        cursor.executemany(self._sql(query), filas)
+        self.metricas.registrar_consulta(query, time.perf_counter() - inicio, cursor.rowcount)
+        return cursor
+
+    def _marcadores(self, cantidad):
+        return ', '.join(['%s'] * cantidad)
+
+    def existentes(self, dnis):
+        dnis = list(dnis)
+        if not dnis:
+            return set()
+        connection = self._conexion()
+        try:
+            cursor = self.cursor(connection)
+            filas = self.consultar(cursor, f'SELECT dni FROM Venta WHERE dni IN ({self._marcadores(len(dnis))})', dnis)
+            return {fila[0] for fila in filas}
+        finally:
+            self.liberar(connection)
+
+    def insertar_lote(self, lote):
+        insertados = []
+        errores = []
+        connection = self._conexion()
+        try:
+            cursor = self.cursor(connection)
+            dnis = [venta.dni for _, venta in lote]
+            filas = self.consultar(cursor, f'SELECT dni FROM Venta WHERE dni IN ({self._marcadores(len(dnis))})', dnis)
+            existentes = {fila[0] for fila in filas}
+
+            nuevos = []
+            for indice, venta in lote:
+                if venta.dni in existentes:
+                    errores.append({'indice': indice, 'dni': venta.dni, 'error': f'Ya existe un cliente con DNI {venta.dni}'})
+                else:
+                    nuevos.append((indice, venta))
+
+            try:
+                self._escribir_ventas(cursor, [venta for _, venta in nuevos])
+                connection.commit()
+                insertados.extend(venta.dni for _, venta in nuevos)
+            except Exception:
+                # Algún registro del bloque falló: se reintenta fila por fila
+                # para aislarlo sin descartar el resto del bloque.
+                connection.rollback()
+                for indice, venta in nuevos:
+                    try:
+                        self._escribir_ventas(cursor, [venta])
+                        connection.commit()
+                        insertados.append(venta.dni)
+                    except Exception as e:
+                        connection.rollback()
+                        errores.append({'indice': indice, 'dni': venta.dni, 'error': str(e)})
+        finally:
+            self.liberar(connection)
+        return insertados, errores
+
+    def _escribir_ventas(self, cursor, ventas):
+        for query, filas in sentencias_insercion(ventas):
+            self.ejecutar_varios(cursor, query, filas)
+
+    def obtener(self, dnis):
+        dnis = list(dnis)
+        ventas = {}
+        if not dnis:
+            return ventas
+        connection = self._conexion()
+        try:
+            cursor = self.cursor(connection, diccionario=True)
+            if len(dnis) == 1:
+                filas = self.consultar(cursor, CONSULTA_VENTAS + ' WHERE v.dni = %s', dnis)
+            else:
+                filas = self.consultar(cursor, CONSULTA_VENTAS + f' WHERE v.dni IN ({self._marcadores(len(dnis))})', dnis)
+            for fila in filas:
+                venta = venta_desde_fila(fila)
+                if venta is not None:
+                    ventas[venta.dni] = venta
+        finally:
+            self.liberar(connection)
+        return ventas
+
+    def iterar(self, tamano_pagina):
+        # Paginación por clave (dni > último visto) en lugar de OFFSET: cada
+        # página usa el índice de la clave primaria y la memoria queda acotada
+        # al tamaño de página. Cada página toma y devuelve su propia conexión,
+        # así un consumidor lento o que corta antes no retiene una del pool.
+        ultimo_dni = None
+        while True:
+            connection = self._conexion()
+            try:
+                cursor = self.cursor(connection, diccionario=True)
+                if ultimo_dni is None:
+                    filas = self.consultar(cursor, CONSULTA_VENTAS + ' ORDER BY v.dni LIMIT %s', (tamano_pagina,))
+                else:
+                    filas = self.consultar(cursor, CONSULTA_VENTAS + ' WHERE v.dni > %s ORDER BY v.dni LIMIT %s', (ultimo_dni, tamano_pagina))
+            finally:
+                self.liberar(connection)
+            for fila in filas:
+                yield venta_desde_fila(fila, incluir_sin_tipo=True)
+            if len(filas) < tamano_pagina:
+                break
+            ultimo_dni = filas[-1]['dni']
+
+    def _columna_orden(self, orden):
+        return f'v.{orden}' + COLACION_INDICE.get((self.dialecto, orden), '')
+
+    def buscar(self, cliente_prefijo, desde, hasta, tipo, limite, despues_de=None):
+        orden = orden_busqueda(cliente_prefijo, desde, hasta)
+        condiciones = []
+        parametros = []
+        if cliente_prefijo:
+            condiciones.append(f"{self._columna_orden('cliente')} LIKE %s ESCAPE '!'")
+            parametros.append(patron_prefijo(cliente_prefijo))
+        if desde is not None:
+            condiciones.append('v.fecha >= %s')
+            parametros.append(desde)
+        if hasta is not None:
+            condiciones.append('v.fecha <= %s')
+            parametros.append(hasta)
+        if tipo is not None:
+            condiciones.append('o.dni IS NOT NULL' if tipo == 'online' else 'l.dni IS NOT NULL')
+        if despues_de is not None:
+            valor, dni = despues_de
+            if orden == 'dni':
+                condiciones.append('v.dni > %s')
+                parametros.append(dni)
+            else:
+                columna = self._columna_orden(orden)
+                condiciones.append(f'({columna} > %s OR ({columna} = %s AND v.dni > %s))')
+                parametros.extend((valor, valor, dni))
+        orden_sql = 'v.dni' if orden == 'dni' else f'{self._columna_orden(orden)}, v.dni'
+        query = CONSULTA_VENTAS
+        if condiciones:
+            query += ' WHERE ' + ' AND '.join(condiciones)
+        query += f' ORDER BY {orden_sql} LIMIT %s'
+        parametros.append(limite)
+
+        connection = self._conexion()
+        try:
+            cursor = self.cursor(connection, diccionario=True)
+            filas = self.consultar(cursor, query, parametros)
+        finally:
+            self.liberar(connection)
+        return [venta for venta in map(venta_desde_fila, filas) if venta is not None]
+
+    def actualizar_lote(self, cambios, tamano_lote, verificar=True):
+        dnis = list(cambios)
+        bloques = [dnis[i:i + tamano_lote] for i in range(0, len(dnis), tamano_lote)]
+        connection = self._conexion()
+        try:
+            cursor = self.cursor(connection)
+            actualizados = set()
+            for bloque in bloques:
+                if verificar:
+                    filas = self.consultar(cursor, f'SELECT dni FROM Venta WHERE dni IN ({self._marcadores(len(bloque))})', bloque)
+                    bloque = [fila[0] for fila in filas]
+                for query, parametros in sentencias_actualizacion({dni: cambios[dni] for dni in bloque}):
+                    self.ejecutar(cursor, query, parametros)
+                actualizados.update(bloque)
+            connection.commit()
+            return actualizados
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self.liberar(connection)
+
+    def eliminar(self, dni):
+        connection = self._conexion()
+        try:
+            cursor = self.cursor(connection)
+            # Las subtablas se limpian explícitamente aunque el esquema tenga
+            # ON DELETE CASCADE: bases anteriores pueden no tenerlo.
+            self.ejecutar(cursor, 'DELETE FROM VentaOnline WHERE dni = %s', (dni,))
+            self.ejecutar(cursor, 'DELETE FROM VentaLocal WHERE dni = %s', (dni,))
+            self.ejecutar(cursor, 'DELETE FROM Venta WHERE dni = %s', (dni,))
+            eliminada = cursor.rowcount > 0
+            connection.commit()
+            return eliminada
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self.liberar(connection)
+
+
+class BackendMySQL(BackendSQL):
+    def __init__(self):
+        self.host = config('DB_HOST')
+        self.database = config('DB_NAME')
+        self.user = config('DB_USER')
+        self.password = config('DB_PASSWORD')
+        self.port = int(config('DB_PORT'))
+        self.pool_size = config('DB_POOL_SIZE', default=5, cast=int)
+        self.pool_timeout = config('DB_POOL_TIMEOUT', default=5.0, cast=float)
+        self.pool_reset_session = config('DB_POOL_RESET_SESSION', default=False, cast=bool)
+        self._pool = None
+        self._estadisticas_pool = {
+            'checkouts': 0,
+            'esperas': 0,
+            'tiempo_espera_total': 0.0,
+            'tiempo_checkout_total': 0.0,
+            'tiempo_checkout_max': 0.0,
+            'errores': 0,
+        }
+
+    def _obtener_pool(self):
+        if self._pool is None:
+            self._pool = pooling.MySQLConnectionPool(
+                pool_name=f'ventas_{id(self)}',
+                pool_size=self.pool_size,
+                pool_reset_session=self.pool_reset_session,
+                host=self.host,
+                database=self.database,
+                user=self.user,
+                password=self.password,
+                port=self.port
+            )
+        return self._pool
+
+    @medido('connect')
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            pool = self._obtener_pool()
+            connection = None
+            inicio_espera = None
+            while connection is None:
+                intento = time.perf_counter()
+                try:
+                    # get_connection() ya comprueba la conexión (is_connected
+                    # hace un ping) y reconecta si el servidor la cerró.
+                    connection = pool.get_connection()
+                except PoolError:
+                    # Pool agotado: se espera a que otra operación libere una
+                    # conexión. Cada checkout cuenta como una sola espera.
+                    if inicio_espera is None:
+                        inicio_espera = intento
+                        self._estadisticas_pool['esperas'] += 1
+                    if time.perf_counter() - inicio_espera >= self.pool_timeout:
+                        self._estadisticas_pool['tiempo_espera_total'] += time.perf_counter() - inicio_espera
+                        raise
+                    time.sleep(0.005)
+            if inicio_espera is not None:
+                # La espera termina al empezar el intento que obtuvo la conexión.
+                self._estadisticas_pool['tiempo_espera_total'] += intento - inicio_espera
+
+            duracion = time.perf_counter() - inicio
+            self._estadisticas_pool['checkouts'] += 1
+            self._estadisticas_pool['tiempo_checkout_total'] += duracion
+            self._estadisticas_pool['tiempo_checkout_max'] = max(self._estadisticas_pool['tiempo_checkout_max'], duracion)
+            logger.debug('Conexión a la base de datos establecida con éxito.')
+            return connection
+        except Error as e:
+            self._estadisticas_pool['errores'] += 1
+            logger.error('Error al conectar a la base de datos: %s', e)
+            return None
+
+    def liberar(self, connection):
+        # En una conexión del pool close() la devuelve al pool en lugar de cerrarla.
+        if connection:
+            connection.close()
+
+    def estadisticas_pool(self):
+        estadisticas = dict(self._estadisticas_pool)
+        checkouts = estadisticas['checkouts']
+        estadisticas['pool_size'] = self.pool_size
+        estadisticas['tiempo_espera_promedio'] = estadisticas['tiempo_espera_total'] / checkouts if checkouts else 0.0
+        estadisticas['tiempo_checkout_promedio'] = estadisticas['tiempo_checkout_total'] / checkouts if checkouts else 0.0
+        return estadisticas
+
+
+class BackendSQLite(BackendSQL):
+    marcador = '?'
+    dialecto = 'sqlite'
+
+    def __init__(self, ruta='ventas.sqlite3'):
+        self.ruta = ruta
+        # Base embebida: una sola conexión persistente, sin pool ni red. El
+        # lock se toma en connect() y se suelta en liberar(), así cada
+        # operación tiene la conexión (y su transacción) para sí sola.
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(ruta, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        crear_tablas(self)
+
+    def cursor(self, connection, diccionario=False):
+        # sqlite3.Row admite acceso por posición y por nombre de columna.
+        return connection.cursor()
+
+    def connect(self):
+        self._lock.acquire()
+        return self._connection
+
+    def liberar(self, connection):
+        self._lock.release()
+
+    def cerrar(self):
+        with self._lock:
+            self._connection.close()
+
+
+class BackendJSONL(BackendVentas):
+    # Almacén de sólo agregado: cada alta o modificación agrega la venta
+    # completa como una línea JSON y cada baja agrega una marca de borrado.
+    # Al abrir se reconstruye el índice en memoria por DNI (gana la última línea).
+
+    def __init__(self, ruta='ventas_db.jsonl', fsync=False):
+        self.ruta = ruta
+        self.fsync = fsync
+        self._ventas = {}
+        # Índices ordenados para buscar(): {'cliente': [(cliente en minúsculas, dni)],
+        # 'fecha': [(fecha, dni)]}. Se construyen en la primera búsqueda y
+        # después se mantienen con cada escritura.
+        self._indices = None
+        self._formato_legado = False
+        if os.path.exists(ruta):
+            self._cargar()
+
+    def _cargar(self):
+        self._formato_legado = not es_json_lines(self.ruta)
+        for registro in leer_registros_json(self.ruta):
+            if registro.get('eliminado'):
+                self._ventas.pop(int(registro['dni']), None)
+            else:
+                venta = venta_desde_registro(registro)
+                self._ventas[venta.dni] = venta
+
+    def _agregar(self, registros):
+        if self._formato_legado:
+            # ventas_db.json guarda un único objeto JSON: antes de agregar
+            # líneas se reescribe el archivo en formato JSON lines.
+            self.compactar()
+        with open(self.ruta, 'a', encoding='utf-8') as archivo:
+            archivo.write(''.join(json.dumps(registro) + '\n' for registro in registros))
+            archivo.flush()
+            if self.fsync:
+                os.fsync(archivo.fileno())
+
+    def compactar(self):
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            for dni in sorted(self._ventas):
+                archivo.write(json.dumps(self._ventas[dni].to_dict()) + '\n')
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, self.ruta)
+        self._formato_legado = False
+
+    def _claves(self, venta):
+        return {'cliente': (venta.cliente.lower(), venta.dni), 'fecha': (venta.fecha, venta.dni)}
+
+    def _indexar(self, ventas):
+        if self._indices is None:
+            return
+        for venta in ventas:
+            for nombre, clave in self._claves(venta).items():
+                bisect.insort(self._indices[nombre], clave)
+
+    def _desindexar(self, ventas):
+        if self._indices is None:
+            return
+        for venta in ventas:
+            for nombre, clave in self._claves(venta).items():
+                indice = self._indices[nombre]
+                posicion = bisect.bisect_left(indice, clave)
+                if posicion < len(indice) and indice[posicion] == clave:
+                    del indice[posicion]
+
+    def _indice(self, nombre):
+        if self._indices is None:
+            claves = [self._claves(venta) for venta in self._ventas.values()]
+            self._indices = {campo: sorted(clave[campo] for clave in claves) for campo in ('cliente', 'fecha')}
+        return self._indices[nombre]
+
+    def existentes(self, dnis):
+        return {dni for dni in dnis if dni in self._ventas}
+
+    def insertar_lote(self, lote):
+        errores = []
+        nuevos = []
+        for indice, venta in lote:
+            if venta.dni in self._ventas:
+                errores.append({'indice': indice, 'dni': venta.dni, 'error': f'Ya existe un cliente con DNI {venta.dni}'})
+            else:
+                nuevos.append(venta)
+        self._agregar([venta.to_dict() for venta in nuevos])
+        for venta in nuevos:
+            self._ventas[venta.dni] = venta
+        self._indexar(nuevos)
+        return [venta.dni for venta in nuevos], errores
+
+    def obtener(self, dnis):
+        return {dni: self._ventas[dni] for dni in dnis if dni in self._ventas}
+
+    def iterar(self, tamano_pagina):
+        for dni in sorted(self._ventas):
+            venta = self._ventas.get(dni)
+            if venta is not None:
+                yield venta
+
+    def buscar(self, cliente_prefijo, desde, hasta, tipo, limite, despues_de=None):
+        orden = orden_busqueda(cliente_prefijo, desde, hasta)
+        if orden == 'dni':
+            inicio = despues_de[1] if despues_de is not None else None
+            claves = ((dni, dni) for dni in sorted(self._ventas) if inicio is None or dni > inicio)
+        else:
+            indice = self._indice(orden)
+            if orden == 'cliente':
+                prefijo = cliente_prefijo.lower()
+                posicion = bisect.bisect_left(indice, (prefijo,))
+                continua = lambda clave: clave[0].startswith(prefijo)
+            else:
+                posicion = bisect.bisect_left(indice, (desde,)) if desde is not None else 0
+                continua = lambda clave: hasta is None or clave[0] <= hasta
+            if despues_de is not None:
+                valor, dni = despues_de
+                cursor = (valor.lower() if orden == 'cliente' else valor, dni)
+                posicion = max(posicion, bisect.bisect_right(indice, cursor))
+            claves = itertools.takewhile(continua, (indice[i] for i in range(posicion, len(indice))))
+
+        ventas = []
+        for _, dni in claves:
+            venta = self._ventas[dni]
+            if coincide_busqueda(venta, cliente_prefijo, desde, hasta, tipo):
+                ventas.append(venta)
+                if len(ventas) >= limite:
+                    break
+        return ventas
+
+    def actualizar_lote(self, cambios, tamano_lote, verificar=True):
+        actualizadas = {
+            dni: aplicar_cambios(self._ventas[dni], campos)
+            for dni, campos in cambios.items() if dni in self._ventas
+        }
+        if actualizadas:
+            # Un único append para todo el lote.
+            self._agregar([venta.to_dict() for venta in actualizadas.values()])
+            self._desindexar([self._ventas[dni] for dni in actualizadas])
+            self._ventas.update(actualizadas)
+            self._indexar(actualizadas.values())
+        return set(actualizadas)
+
+    def eliminar(self, dni):
+        dni = int(dni)
+        if dni not in self._ventas:
+            return False
+        self._agregar([{'dni': dni, 'eliminado': True}])
+        self._desindexar([self._ventas.pop(dni)])
+        return True
+
+
+def crear_backend(nombre=None):
+    nombre = nombre or config('DB_BACKEND', default='mysql')
+    if nombre == 'mysql':
+        return BackendMySQL()
+    if nombre == 'sqlite':
+        return BackendSQLite(config('DB_SQLITE_PATH', default='ventas.sqlite3'))
+    if nombre == 'jsonl':
+        return BackendJSONL(config('DB_JSONL_PATH', default='ventas_db.jsonl'), fsync=config('DB_JSONL_FSYNC', default=False, cast=bool))
+    raise ValueError(f'Backend de almacenamiento desconocido: {nombre}')
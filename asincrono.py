@@ -0,0 +1,408 @@
+import asyncio
+import logging
+import time
+
+from mysql.connector import Error
+from mysql.connector.aio import connect
+from decouple import config
+
+from almacenamiento import CONSULTA_VENTAS, sentencias_actualizacion, sentencias_insercion, venta_desde_fila
+from cache_ventas import CacheVentas
+from modelos import CAMPOS_ACTUALIZABLES, VentaLocal, VentaOnline, validar_cambio
+
+logger = logging.getLogger(__name__)
+
+
+class PoolConexionesAsync:
+    # mysql.connector.aio no trae pool propio: las conexiones libres esperan
+    # en una cola y se abren bajo demanda hasta llegar a pool_size.
+
+    def __init__(self, pool_size, pool_timeout, **parametros):
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._parametros = parametros
+        self._libres = asyncio.LifoQueue()
+        self._abiertas = 0
+        self._estadisticas = {
+            'checkouts': 0,
+            'esperas': 0,
+            'tiempo_espera_total': 0.0,
+            'tiempo_checkout_total': 0.0,
+            'tiempo_checkout_max': 0.0,
+            'reconexiones': 0,
+            'errores': 0,
+        }
+
+    async def obtener(self):
+        inicio = time.perf_counter()
+        try:
+            if self._libres.empty() and self._abiertas < self.pool_size:
+                self._abiertas += 1
+                try:
+                    connection = await connect(**self._parametros)
+                except BaseException:
+                    self._abiertas -= 1
+                    raise
+            else:
+                if self._libres.empty():
+                    self._estadisticas['esperas'] += 1
+                connection = await asyncio.wait_for(self._libres.get(), self.pool_timeout)
+                self._estadisticas['tiempo_espera_total'] += time.perf_counter() - inicio
+                # Chequeo de salud al retirar la conexión del pool. Si no se
+                # puede reconectar se descarta y su lugar queda libre.
+                if not await connection.is_connected():
+                    try:
+                        await connection.reconnect(attempts=2, delay=0)
+                    except BaseException:
+                        self._abiertas -= 1
+                        try:
+                            await connection.close()
+                        except Error:
+                            pass
+                        raise
+                    self._estadisticas['reconexiones'] += 1
+        except (Error, asyncio.TimeoutError):
+            self._estadisticas['errores'] += 1
+            raise
+
+        duracion = time.perf_counter() - inicio
+        self._estadisticas['checkouts'] += 1
+        self._estadisticas['tiempo_checkout_total'] += duracion
+        self._estadisticas['tiempo_checkout_max'] = max(self._estadisticas['tiempo_checkout_max'], duracion)
+        return connection
+
+    def liberar(self, connection):
+        self._libres.put_nowait(connection)
+
+    async def descartar(self, connection):
+        # Conexión en estado dudoso tras un error: se cierra y se repone con
+        # una nueva para no dejar esperando a quien ya está en la cola.
+        try:
+            await connection.close()
+        except Error:
+            pass
+        try:
+            self._libres.put_nowait(await connect(**self._parametros))
+        except Error:
+            self._abiertas -= 1
+
+    async def cerrar(self):
+        while not self._libres.empty():
+            connection = self._libres.get_nowait()
+            self._abiertas -= 1
+            await connection.close()
+
+    def estadisticas(self):
+        estadisticas = dict(self._estadisticas)
+        checkouts = estadisticas['checkouts']
+        estadisticas['pool_size'] = self.pool_size
+        estadisticas['abiertas'] = self._abiertas
+        estadisticas['tiempo_espera_promedio'] = estadisticas['tiempo_espera_total'] / checkouts if checkouts else 0.0
+        estadisticas['tiempo_checkout_promedio'] = estadisticas['tiempo_checkout_total'] / checkouts if checkouts else 0.0
+        return estadisticas
+
+
+class _Conexion:
+    # Retira una conexión del pool respetando el límite de concurrencia y la
+    # devuelve al salir; si hubo un error la descarta.
+
+    def __init__(self, ventas):
+        self._ventas = ventas
+        self._connection = None
+
+    async def __aenter__(self):
+        await self._ventas._semaforo.acquire()
+        try:
+            self._connection = await self._ventas.pool.obtener()
+        except BaseException:
+            self._ventas._semaforo.release()
+            raise
+        return self._connection
+
+    async def __aexit__(self, tipo, error, traza):
+        try:
+            if error is None:
+                self._ventas.pool.liberar(self._connection)
+            else:
+                await self._ventas.pool.descartar(self._connection)
+        finally:
+            self._ventas._semaforo.release()
+
+
+class AsyncProductosVendidos:
+
+    def __init__(self):
+        pool_size = config('DB_POOL_SIZE', default=5, cast=int)
+        self.pool = PoolConexionesAsync(
+            pool_size=pool_size,
+            pool_timeout=config('DB_POOL_TIMEOUT', default=5.0, cast=float),
+            host=config('DB_HOST'),
+            database=config('DB_NAME'),
+            user=config('DB_USER'),
+            password=config('DB_PASSWORD'),
+            port=int(config('DB_PORT'))
+        )
+        self.tamano_lote = config('DB_BATCH_SIZE', default=1000, cast=int)
+        self.tamano_pagina = config('DB_PAGE_SIZE', default=1000, cast=int)
+        # Más operaciones en curso que conexiones sólo agregaría tareas
+        # esperando en la cola del pool, donde vence pool_timeout.
+        self._semaforo = asyncio.Semaphore(min(config('DB_ASYNC_CONCURRENCIA', default=pool_size, cast=int), pool_size))
+        self.cache = None
+        if config('CACHE_HABILITADO', default=True, cast=bool):
+            self.cache = CacheVentas(
+                tamano_maximo=config('CACHE_TAMANO', default=1024, cast=int),
+                ttl=config('CACHE_TTL', default=300, cast=float)
+            )
+        self._lecturas_pendientes = {}
+        self._despacho = None
+
+    def _conexion(self):
+        return _Conexion(self)
+
+    def _invalidar_cache(self, dni):
+        if self.cache is not None:
+            self.cache.invalidar(dni)
+
+    def estadisticas_pool(self):
+        return self.pool.estadisticas()
+
+    def estadisticas_cache(self):
+        if self.cache is None:
+            return None
+        return self.cache.estadisticas()
+
+    async def cerrar(self):
+        await self.pool.cerrar()
+
+    async def crear_venta(self, venta):
+        # Igual que ProductosVendidos.crear_venta: los rechazos se registran
+        # en el log y no interrumpen a quien llama.
+        resultado = await self.crear_ventas([venta])
+        if resultado['errores']:
+            logger.warning('No se pudo crear la venta: %s', resultado['errores'][0]['error'])
+            return
+        logger.info('Venta %s creada correctamente.', venta.cliente)
+
+    async def crear_ventas(self, ventas, tamano_lote=None):
+        tamano_lote = tamano_lote or self.tamano_lote
+        resultado = {'insertadas': 0, 'errores': []}
+        vistos = set()
+        lote = []
+        lotes = []
+        for indice, venta in enumerate(ventas):
+            if not isinstance(venta, (VentaOnline, VentaLocal)):
+                resultado['errores'].append({'indice': indice, 'dni': getattr(venta, 'dni', None), 'error': 'Tipo de venta no soportado'})
+                continue
+            if venta.dni in vistos:
+                resultado['errores'].append({'indice': indice, 'dni': venta.dni, 'error': f'DNI {venta.dni} repetido en el lote'})
+                continue
+            vistos.add(venta.dni)
+            lote.append((indice, venta))
+            if len(lote) >= tamano_lote:
+                lotes.append(lote)
+                lote = []
+        if lote:
+            lotes.append(lote)
+
+        # Los bloques tienen DNIs disjuntos, así que pueden escribirse en paralelo.
+        for insertados, errores in await asyncio.gather(*(self._insertar_lote(lote) for lote in lotes)):
+            resultado['insertadas'] += len(insertados)
+            resultado['errores'].extend(errores)
+            for dni in insertados:
+                self._invalidar_cache(dni)
+        return resultado
+
+    async def _insertar_lote(self, lote):
+        insertados = []
+        errores = []
+        try:
+            async with self._conexion() as connection:
+                cursor = await connection.cursor()
+                dnis = [venta.dni for _, venta in lote]
+                marcadores = ', '.join(['%s'] * len(dnis))
+                await cursor.execute(f'SELECT dni FROM Venta WHERE dni IN ({marcadores})', dnis)
+                existentes = {fila[0] for fila in await cursor.fetchall()}
+
+                nuevos = []
+                for indice, venta in lote:
+                    if venta.dni in existentes:
+                        errores.append({'indice': indice, 'dni': venta.dni, 'error': f'Ya existe un cliente con DNI {venta.dni}'})
+                    else:
+                        nuevos.append((indice, venta))
+
+                try:
+                    await self._escribir_ventas(cursor, [venta for _, venta in nuevos])
+                    await connection.commit()
+                    insertados.extend(venta.dni for _, venta in nuevos)
+                except Error:
+                    # Se reintenta fila por fila para aislar el registro que falla.
+                    await connection.rollback()
+                    for indice, venta in nuevos:
+                        try:
+                            await self._escribir_ventas(cursor, [venta])
+                            await connection.commit()
+                            insertados.append(venta.dni)
+                        except Error as e:
+                            await connection.rollback()
+                            errores.append({'indice': indice, 'dni': venta.dni, 'error': str(e)})
+        except (Error, asyncio.TimeoutError) as e:
+            registrados = {error['indice'] for error in errores}
+            errores.extend(
+                {'indice': indice, 'dni': venta.dni, 'error': str(e) or 'Tiempo de espera agotado'}
+                for indice, venta in lote
+                if indice not in registrados and venta.dni not in insertados
+            )
+        return insertados, errores
+
+    async def _escribir_ventas(self, cursor, ventas):
+        for query, filas in sentencias_insercion(ventas):
+            await cursor.executemany(query, filas)
+
+    async def leer_venta(self, dni):
+        # Las lecturas que llegan en la misma vuelta del event loop (por
+        # ejemplo desde asyncio.gather) se agrupan en una sola consulta IN.
+        dni = int(dni)
+        if self.cache is not None:
+            venta = self.cache.obtener(dni)
+            if venta is not None:
+                return venta
+        futuro = asyncio.get_running_loop().create_future()
+        self._lecturas_pendientes.setdefault(dni, []).append(futuro)
+        if self._despacho is None:
+            self._despacho = asyncio.ensure_future(self._despachar_lecturas())
+        return await futuro
+
+    async def _despachar_lecturas(self):
+        await asyncio.sleep(0)
+        pendientes = self._lecturas_pendientes
+        self._lecturas_pendientes = {}
+        self._despacho = None
+        try:
+            ventas = await self.leer_ventas(pendientes)
+        except Exception as e:
+            for futuros in pendientes.values():
+                for futuro in futuros:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+            return
+        for dni, futuros in pendientes.items():
+            for futuro in futuros:
+                if not futuro.done():
+                    futuro.set_result(ventas.get(dni))
+
+    async def leer_ventas(self, dnis):
+        ventas = {}
+        pendientes = []
+        for dni in dict.fromkeys(int(dni) for dni in dnis):
+            venta = self.cache.obtener(dni) if self.cache is not None else None
+            if venta is not None:
+                ventas[dni] = venta
+            else:
+                pendientes.append(dni)
+
+        bloques = [pendientes[inicio:inicio + self.tamano_lote] for inicio in range(0, len(pendientes), self.tamano_lote)]
+        for encontradas in await asyncio.gather(*(self._leer_bloque(bloque) for bloque in bloques)):
+            ventas.update(encontradas)
+            if self.cache is not None:
+                for venta in encontradas.values():
+                    self.cache.guardar(venta)
+        return ventas
+
+    async def _leer_bloque(self, dnis):
+        ventas = {}
+        async with self._conexion() as connection:
+            cursor = await connection.cursor(dictionary=True)
+            marcadores = ', '.join(['%s'] * len(dnis))
+            await cursor.execute(CONSULTA_VENTAS + f' WHERE v.dni IN ({marcadores})', dnis)
+            for fila in await cursor.fetchall():
+                venta = venta_desde_fila(fila)
+                if venta is not None:
+                    ventas[venta.dni] = venta
+        return ventas
+
+    async def iterar_ventas(self, tamano_pagina=None):
+        # Cada página toma y devuelve su propia conexión, así un consumidor
+        # lento no retiene una conexión del pool entre páginas.
+        tamano_pagina = tamano_pagina or self.tamano_pagina
+        ultimo_dni = None
+        while True:
+            async with self._conexion() as connection:
+                cursor = await connection.cursor(dictionary=True)
+                if ultimo_dni is None:
+                    await cursor.execute(CONSULTA_VENTAS + ' ORDER BY v.dni LIMIT %s', (tamano_pagina,))
+                else:
+                    await cursor.execute(CONSULTA_VENTAS + ' WHERE v.dni > %s ORDER BY v.dni LIMIT %s', (ultimo_dni, tamano_pagina))
+                filas = await cursor.fetchall()
+            for fila in filas:
+                yield venta_desde_fila(fila, incluir_sin_tipo=True)
+            if len(filas) < tamano_pagina:
+                break
+            ultimo_dni = filas[-1]['dni']
+
+    async def actualizar_ventas(self, cambios, tamano_lote=None):
+        # Igual que ProductosVendidos.actualizar_ventas: una transacción con
+        # UPDATE agrupados por tabla; los valores inválidos se informan por DNI.
+        tamano_lote = tamano_lote or self.tamano_lote
+        resultado = {'actualizadas': 0, 'no_encontradas': [], 'errores': []}
+        validos = {}
+        for dni, campos in cambios:
+            try:
+                validados = {campo: validar_cambio(campo, valor) for campo, valor in campos.items()}
+                validos.setdefault(int(dni), {}).update(validados)
+            except (ValueError, TypeError) as e:
+                resultado['errores'].append({'dni': dni, 'error': str(e)})
+        if not validos:
+            return resultado
+
+        dnis = list(validos)
+        actualizadas = set()
+        try:
+            async with self._conexion() as connection:
+                cursor = await connection.cursor()
+                try:
+                    for inicio in range(0, len(dnis), tamano_lote):
+                        bloque = dnis[inicio:inicio + tamano_lote]
+                        marcadores = ', '.join(['%s'] * len(bloque))
+                        await cursor.execute(f'SELECT dni FROM Venta WHERE dni IN ({marcadores})', bloque)
+                        bloque = [fila[0] for fila in await cursor.fetchall()]
+                        for query, parametros in sentencias_actualizacion({dni: validos[dni] for dni in bloque}):
+                            await cursor.execute(query, parametros)
+                        actualizadas.update(bloque)
+                    await connection.commit()
+                except Error:
+                    await connection.rollback()
+                    raise
+        except (Error, asyncio.TimeoutError) as e:
+            logger.error('Error al actualizar las ventas: %s', e)
+            resultado['errores'].extend({'dni': dni, 'error': str(e) or 'Tiempo de espera agotado'} for dni in dnis)
+            return resultado
+        finally:
+            for dni in dnis:
+                self._invalidar_cache(dni)
+        resultado['actualizadas'] = len(actualizadas)
+        resultado['no_encontradas'] = [dni for dni in dnis if dni not in actualizadas]
+        return resultado
+
+    async def actualizar_venta(self, dni, campo, nuevo_valor):
+        if campo not in CAMPOS_ACTUALIZABLES:
+            logger.warning('Campo no reconocido: %s', campo)
+            return False
+        resultado = await self.actualizar_ventas([(dni, {campo: nuevo_valor})])
+        if resultado['errores']:
+            logger.error('Error al actualizar el cliente: %s', resultado['errores'][0]['error'])
+            return False
+        if resultado['no_encontradas']:
+            logger.info('No se encontró venta con DNI %s.', dni)
+            return False
+        return True
+
+    async def eliminar_venta(self, dni):
+        async with self._conexion() as connection:
+            cursor = await connection.cursor()
+            await cursor.execute('DELETE FROM VentaOnline WHERE dni = %s', (dni,))
+            await cursor.execute('DELETE FROM VentaLocal WHERE dni = %s', (dni,))
+            await cursor.execute('DELETE FROM Venta WHERE dni = %s', (dni,))
+            eliminada = cursor.rowcount > 0
+            await connection.commit()
+        self._invalidar_cache(dni)
+        return eliminada
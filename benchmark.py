@@ -0,0 +1,309 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from almacenamiento import BackendJSONL, BackendSQL, BackendSQLite, crear_backend
+from clase import ProductosVendidos
+from esquema import crear_tablas
+from metricas import Instrumentacion
+from modelos import VentaLocal, VentaOnline
+
+
+class _VentaDict:
+    # Réplica de la representación original (atributos en __dict__ y
+    # strptime en cada construcción) usada como referencia de comparación.
+    def __init__(self, dni, fecha, cliente, producto_vendido):
+        self.__dni = self.validar_dni(dni)
+        self.__fecha = datetime.datetime.strptime(fecha, '%Y-%m-%d').date()
+        self.__cliente = cliente
+        self.__producto_vendido = int(producto_vendido)
+
+    def validar_dni(self, dni):
+        dni_num = int(dni)
+        if len(str(dni)) not in [7, 8] or dni_num <= 0:
+            raise ValueError("El DNI debe ser numérico y estar compuesto por 7 u 8 dígitos")
+        return dni_num
+
+    @property
+    def producto_vendido(self):
+        return self.__producto_vendido
+
+
+class _VentaOnlineDict(_VentaDict):
+    def __init__(self, dni, fecha, cliente, producto_vendido):
+        super().__init__(dni, fecha, cliente, producto_vendido)
+        self.__descuento_efectivo = self.producto_vendido * 0.10 if self.producto_vendido > 2 else 0
+
+
+class _VentaLocalDict(_VentaDict):
+    def __init__(self, dni, fecha, cliente, producto_vendido):
+        super().__init__(dni, fecha, cliente, producto_vendido)
+        self.__envio_gratis = self.producto_vendido > 2
+
+
+def generar_filas(cantidad, semilla=42):
+    aleatorio = random.Random(semilla)
+    inicio = datetime.date(2024, 1, 1)
+    filas = []
+    for i in range(cantidad):
+        fecha = inicio + datetime.timedelta(days=aleatorio.randrange(365))
+        filas.append((
+            10000000 + i,
+            fecha.isoformat(),
+            f'cliente {aleatorio.randrange(10000)}',
+            aleatorio.randint(1, 6),
+            aleatorio.random() < 0.5,
+        ))
+    return filas
+
+
+def _medir(nombre, filas, construir):
+    inicio = time.perf_counter()
+    for fila in filas:
+        construir(fila)
+    duracion = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    objetos = [construir(fila) for fila in filas]
+    memoria = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    del objetos
+
+    return {
+        'variante': nombre,
+        'objetos': len(filas),
+        'objetos_por_segundo': len(filas) / duracion if duracion else 0.0,
+        'bytes_por_objeto': memoria / len(filas),
+    }
+
+
+def benchmark_modelos(cantidad):
+    filas = generar_filas(cantidad)
+    # Los objetos referencian las filas ya generadas, así que la memoria
+    # medida corresponde sólo a la instancia (y a la fecha parseada).
+    variantes = [
+        ('dict', lambda f: (_VentaOnlineDict if f[4] else _VentaLocalDict)(str(f[0]), f[1], f[2], f[3])),
+        ('slots', lambda f: (VentaOnline if f[4] else VentaLocal)(str(f[0]), f[1], f[2], f[3])),
+        ('slots_desde_db', lambda f: (VentaOnline if f[4] else VentaLocal).desde_db(f[0], f[1], f[2], f[3])),
+    ]
+    return [_medir(nombre, filas, construir) for nombre, construir in variantes]
+
+
+def generar_ventas(cantidad, semilla=42, dni_inicial=10000000):
+    return [
+        (VentaOnline if es_online else VentaLocal).desde_db(dni_inicial - 10000000 + dni, fecha, cliente, producto)
+        for dni, fecha, cliente, producto, es_online in generar_filas(cantidad, semilla)
+    ]
+
+
+def _latencias(muestras):
+    # Percentiles exactos a partir de las muestras individuales (en segundos).
+    ordenadas = sorted(muestras)
+    total = sum(ordenadas)
+
+    def percentil(p):
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))] * 1000
+
+    return {
+        'operaciones': len(ordenadas),
+        'operaciones_por_segundo': len(ordenadas) / total if total else 0.0,
+        'p50_ms': percentil(50),
+        'p99_ms': percentil(99),
+        'maximo_ms': ordenadas[-1] * 1000,
+    }
+
+
+def _medir_operaciones(argumentos, operacion):
+    muestras = []
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        operacion(argumento)
+        muestras.append(time.perf_counter() - inicio)
+    return _latencias(muestras)
+
+
+def _crear_ventas_benchmark(backend, directorio, usar_cache):
+    if backend == 'sqlite':
+        almacen = BackendSQLite(os.path.join(directorio, 'benchmark.sqlite3'))
+    elif backend == 'jsonl':
+        almacen = BackendJSONL(os.path.join(directorio, 'benchmark.jsonl'))
+    else:
+        almacen = crear_backend(backend)
+        crear_tablas(almacen)
+    ventas = ProductosVendidos(backend=almacen, metricas=Instrumentacion(habilitada=False))
+    if not usar_cache:
+        # Sin caché cada lectura llega al backend, que es lo que se mide.
+        ventas.cache = None
+    return ventas
+
+
+def _eliminar_sembradas(almacen, dnis):
+    # Contra una base configurada (mysql) se borran sólo las ventas que
+    # insertó la corrida, así la siguiente puede volver a cargarlas.
+    if not isinstance(almacen, BackendSQL):
+        for dni in dnis:
+            almacen.eliminar(dni)
+        return
+    connection = almacen._conexion()
+    try:
+        cursor = almacen.cursor(connection)
+        for inicio in range(0, len(dnis), 1000):
+            bloque = dnis[inicio:inicio + 1000]
+            for tabla in ('VentaOnline', 'VentaLocal', 'Venta'):
+                almacen.ejecutar(cursor, f'DELETE FROM {tabla} WHERE dni IN ({almacen._marcadores(len(bloque))})', bloque)
+        connection.commit()
+    finally:
+        almacen.liberar(connection)
+
+
+def benchmark_crud(tamano, backend='sqlite', operaciones=1000, usar_cache=False, semilla=42):
+    aleatorio = random.Random(semilla)
+    sembradas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ventas = _crear_ventas_benchmark(backend, directorio, usar_cache)
+        try:
+            existentes = generar_ventas(tamano, semilla)
+            inicio = time.perf_counter()
+            resultado = ventas.crear_ventas(existentes)
+            duracion = time.perf_counter() - inicio
+            fallidas = {error['dni'] for error in resultado['errores']}
+            sembradas.extend(venta.dni for venta in existentes if venta.dni not in fallidas)
+            if resultado['errores']:
+                raise RuntimeError(f"La carga inicial falló: {resultado['errores'][:3]}")
+            carga = {'filas': tamano, 'segundos': duracion, 'filas_por_segundo': tamano / duracion if duracion else 0.0}
+
+            dnis = [venta.dni for venta in existentes]
+            muestra = [aleatorio.choice(dnis) for _ in range(operaciones)]
+            nuevas = generar_ventas(operaciones, semilla + 1, dni_inicial=10000000 + tamano)
+            previas = ventas.backend.existentes([venta.dni for venta in nuevas])
+            creadas = [venta.dni for venta in nuevas if venta.dni not in previas]
+            sembradas.extend(creadas)
+
+            resultados = {
+                'tamano': tamano,
+                'carga_masiva': carga,
+                'crear': _medir_operaciones(nuevas, ventas.crear_venta),
+                'leer': _medir_operaciones(muestra, ventas.leer_venta),
+                'actualizar': _medir_operaciones(muestra, lambda dni: ventas.actualizar_venta(dni, 'cliente', 'benchmark')),
+            }
+
+            inicio = time.perf_counter()
+            ventas.actualizar_ventas([(dni, {'producto_vendido': 3}) for dni in muestra])
+            duracion = time.perf_counter() - inicio
+            resultados['actualizar_lote'] = {'filas': len(muestra), 'segundos': duracion, 'filas_por_segundo': len(muestra) / duracion if duracion else 0.0}
+
+            inicio = time.perf_counter()
+            listadas = sum(1 for _ in ventas.iterar_ventas())
+            duracion = time.perf_counter() - inicio
+            resultados['listar'] = {'filas': listadas, 'segundos': duracion, 'filas_por_segundo': listadas / duracion if duracion else 0.0}
+
+            resultados['eliminar'] = _medir_operaciones(creadas, ventas.eliminar_venta)
+        finally:
+            if backend not in ('sqlite', 'jsonl'):
+                _eliminar_sembradas(ventas.backend, sembradas)
+            ventas.cerrar()
+    return resultados
+
+
+def _version_codigo():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Parámetros de la corrida que deben coincidir para que comparar tenga sentido.
+CAMPOS_COMPARABLES = ('backend', 'cache', 'operaciones')
+
+
+def verificar_comparables(actual, anterior):
+    distintos = [campo for campo in CAMPOS_COMPARABLES if actual.get(campo) != anterior.get(campo)]
+    if distintos:
+        detalle = ', '.join(f'{campo}: {anterior.get(campo)!r} en la anterior, {actual.get(campo)!r} en la actual' for campo in distintos)
+        raise ValueError(f'Las corridas no son comparables ({detalle})')
+
+
+def comparar(actual, anterior, tolerancia):
+    # Marca como regresión toda métrica de velocidad que cayó más que la
+    # tolerancia o latencia p50/p99 que creció más que la tolerancia.
+    verificar_comparables(actual, anterior)
+    regresiones = []
+    previos = {resultado['tamano']: resultado for resultado in anterior['resultados']}
+    for resultado in actual['resultados']:
+        previo = previos.get(resultado['tamano'])
+        if previo is None:
+            continue
+        for operacion, metricas in resultado.items():
+            if not isinstance(metricas, dict) or operacion not in previo:
+                continue
+            for clave, valor in metricas.items():
+                base = previo[operacion].get(clave)
+                if not base:
+                    continue
+                if clave.endswith('por_segundo') and valor < base * (1 - tolerancia):
+                    regresiones.append({'tamano': resultado['tamano'], 'operacion': operacion, 'metrica': clave, 'anterior': base, 'actual': valor})
+                elif clave in ('p50_ms', 'p99_ms') and valor > base * (1 + tolerancia):
+                    regresiones.append({'tamano': resultado['tamano'], 'operacion': operacion, 'metrica': clave, 'anterior': base, 'actual': valor})
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de ventas')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    modelos = subparsers.add_parser('modelos', help='Memoria y velocidad de construcción de Venta')
+    modelos.add_argument('-n', '--cantidad', type=int, default=100000)
+
+    crud = subparsers.add_parser('crud', help='Rendimiento de las operaciones de ProductosVendidos')
+    crud.add_argument('--tamanos', type=int, nargs='+', default=[1000, 10000, 100000], help='ventas precargadas en cada corrida')
+    crud.add_argument('--operaciones', type=int, default=1000, help='operaciones medidas por tipo')
+    crud.add_argument('--backend', default='sqlite', help='sqlite y jsonl usan un directorio temporal; mysql usa la configuración DB_* (usar una base descartable)')
+    crud.add_argument('--cache', action='store_true', help='mantiene habilitada la caché de lecturas')
+    crud.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    crud.add_argument('--comparar', help='resultados JSON de una versión anterior')
+    crud.add_argument('--tolerancia', type=float, default=0.10, help='variación admitida antes de marcar una regresión')
+
+    args = parser.parse_args()
+    if args.comando == 'modelos':
+        resultados = benchmark_modelos(args.cantidad)
+    else:
+        resultados = {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'version': _version_codigo(),
+            'python': platform.python_version(),
+            'backend': args.backend,
+            'cache': args.cache,
+            'operaciones': args.operaciones,
+        }
+        anterior = None
+        if args.comparar:
+            # Se verifica antes de medir para no gastar la corrida.
+            with open(args.comparar, encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+            try:
+                verificar_comparables(resultados, anterior)
+            except ValueError as e:
+                parser.error(str(e))
+        resultados['resultados'] = [benchmark_crud(tamano, args.backend, args.operaciones, args.cache) for tamano in args.tamanos]
+        if anterior is not None:
+            resultados['regresiones'] = comparar(resultados, anterior, args.tolerancia)
+    if getattr(args, 'salida', None):
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=4)
+    print(json.dumps(resultados, indent=4))
+    return 1 if isinstance(resultados, dict) and resultados.get('regresiones') else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
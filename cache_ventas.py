@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+
+
+class CacheVentas:
+    def __init__(self, tamano_maximo=1024, ttl=300):
+        self.tamano_maximo = tamano_maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._aciertos = 0
+        self._fallos = 0
+        self._desalojos = 0
+        self._expiradas = 0
+        self._invalidaciones = 0
+
+    def _clave(self, dni):
+        try:
+            return int(dni)
+        except (TypeError, ValueError):
+            return None
+
+    def obtener(self, dni):
+        clave = self._clave(dni)
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self._fallos += 1
+            return None
+
+        venta, expira = entrada
+        if expira <= time.monotonic():
+            del self._entradas[clave]
+            self._expiradas += 1
+            self._fallos += 1
+            return None
+
+        self._entradas.move_to_end(clave)
+        self._aciertos += 1
+        return venta
+
+    def contiene(self, dni):
+        # Consulta interna (duplicados, existencia): no cuenta como acierto ni
+        # fallo y no altera el orden LRU.
+        entrada = self._entradas.get(self._clave(dni))
+        return entrada is not None and entrada[1] > time.monotonic()
+
+    def guardar(self, venta):
+        clave = self._clave(venta.dni)
+        self._entradas[clave] = (venta, time.monotonic() + self.ttl)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.tamano_maximo:
+            # El primer elemento del OrderedDict es el usado menos recientemente.
+            self._entradas.popitem(last=False)
+            self._desalojos += 1
+
+    def invalidar(self, dni):
+        if self._entradas.pop(self._clave(dni), None) is not None:
+            self._invalidaciones += 1
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    def estadisticas(self):
+        consultas = self._aciertos + self._fallos
+        return {
+            'entradas': len(self._entradas),
+            'tamano_maximo': self.tamano_maximo,
+            'ttl': self.ttl,
+            'aciertos': self._aciertos,
+            'fallos': self._fallos,
+            'desalojos': self._desalojos,
+            'expiradas': self._expiradas,
+            'invalidaciones': self._invalidaciones,
+            'tasa_aciertos': self._aciertos / consultas if consultas else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entradas)
@@ -1,261 +1,248 @@
-import mysql.connector
-from mysql.connector import Error
-import json
-import datetime
+import logging
 from decouple import config
+from almacenamiento import clave_busqueda, crear_backend, orden_busqueda
+from cache_ventas import CacheVentas
+from metricas import METRICAS, medido
+# Los modelos viven en modelos.py; se reexportan para quienes los importan desde aquí.
+from modelos import CAMPOS_ACTUALIZABLES, Venta, VentaLocal, VentaOnline, parsear_fecha, validar_cambio
 
-class Venta:
-    def __init__(self, dni, fecha, cliente, producto_vendido):
-        self.__dni = self.validar_dni(dni)
-        self.__fecha = self.validar_fecha(fecha)
-        self.__cliente = cliente  
-        self.__producto_vendido = self.validar_producto(producto_vendido)
+logger = logging.getLogger(__name__)
 
-    @property
-    def dni(self):
-        return self.__dni
-    
-    @property
-    def fecha(self):
-        return self.__fecha
-    
-    @property
-    def cliente(self):
-        return self.__cliente
-    
-    @property
-    def producto_vendido(self):
-        return self.__producto_vendido
-    
-    def validar_fecha(self, fecha_str):
-        try:
-            fecha = datetime.datetime.strptime(fecha_str, '%Y-%m-%d').date()
-            return fecha
-        except ValueError:
-            raise ValueError("Formato de fecha incorrecto. Debe ser YYYY-MM-DD.")
-
-    def validar_producto(self, producto):
-        try:
-            cantidad_producto = int(producto)
-            return cantidad_producto
-        except ValueError:
-            raise ValueError("La cantidad ingresada no es correcta")
-        
-    def validar_dni(self, dni):
-        try:
-            dni_num = int(dni)
-            if len(str(dni)) not in [7, 8]:
-                raise ValueError("El DNI debe tener 7 u 8 dígitos")
-            if dni_num <= 0:
-                raise ValueError("El DNI debe ser un número positivo")
-            return dni_num
-        except ValueError:
-            raise ValueError("El DNI debe ser numérico y estar compuesto por 7 u 8 dígitos")
-            
-    def to_dict(self):
-        return {
-            "dni": self.dni,
-            "fecha": str(self.fecha),
-            "cliente": self.cliente,
-            "producto_vendido": self.producto_vendido,
-        }
 
-    def __str__(self):
-        return f"{self.fecha} {self.cliente}"  
-    
-
-class VentaOnline(Venta):
-    def __init__(self, dni, fecha, cliente, producto_vendido):
-        super().__init__(dni, fecha, cliente, producto_vendido)
-        self.__descuento_efectivo = self.calcular_descuento()
-
-    @property
-    def descuento_efectivo(self):
-        return self.__descuento_efectivo
-
-    def calcular_descuento(self):
-        if self.producto_vendido > 2:
-            return self.producto_vendido * 0.10
-        return 0
+class ProductosVendidos:
+     
+    def __init__(self, backend=None, metricas=None):
+        self.backend = backend or crear_backend()
+        self.metricas = metricas or METRICAS
+        self.backend.metricas = self.metricas
+        self.tamano_lote = config('DB_BATCH_SIZE', default=1000, cast=int)
+        self.tamano_pagina = config('DB_PAGE_SIZE', default=1000, cast=int)
+        self.cache = None
+        if config('CACHE_HABILITADO', default=True, cast=bool):
+            self.cache = CacheVentas(
+                tamano_maximo=config('CACHE_TAMANO', default=1024, cast=int),
+                ttl=config('CACHE_TTL', default=300, cast=float)
+            )
 
-    def to_dict(self):
-        data = super().to_dict()
-        data["descuento_efectivo"] = self.descuento_efectivo
-        return data
+    def _en_cache(self, dni):
+        if self.cache is None:
+            return None
+        return self.cache.obtener(dni)
 
-    def __str__(self):
-        return f"{super().__str__()} - Descuento: {self.descuento_efectivo}"
-    
+    def _existe_en_cache(self, dni):
+        return self.cache is not None and self.cache.contiene(dni)
 
-class VentaLocal(Venta):
-    def __init__(self, dni, fecha, cliente, producto_vendido):
-        super().__init__(dni, fecha, cliente, producto_vendido)
-        self.__envio_gratis = self.calcular_envio_gratis()
+    def _invalidar_cache(self, dni):
+        if self.cache is not None:
+            self.cache.invalidar(dni)
 
-    @property
-    def envio_gratis(self):
-        return self.__envio_gratis
+    def estadisticas_cache(self):
+        if self.cache is None:
+            return None
+        return self.cache.estadisticas()
 
-    def calcular_envio_gratis(self):
-        return self.producto_vendido > 2
+    def connect(self):
+        return self.backend.connect()
 
-    def to_dict(self):
-        data = super().to_dict()
-        data["envio_gratis"] = self.envio_gratis
-        return data
+    def liberar(self, connection):
+        self.backend.liberar(connection)
 
-    def __str__(self):
-        return f"{super().__str__()} - Envío gratis: {self.envio_gratis}"
+    def estadisticas_pool(self):
+        return self.backend.estadisticas_pool()
 
-    
-class ProductosVendidos:
-     
-    def __init__(self):
-        self.host = config('DB_HOST')
-        self.database = config('DB_NAME')
-        self.user = config('DB_USER')
-        self.password = config('DB_PASSWORD')
-        self.port = int(config('DB_PORT')) 
+    def cerrar(self):
+        self.backend.cerrar()
 
-    def connect(self):
-        try:
-            connection = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password,
-                port=self.port
-            )
-            if connection.is_connected():
-                print("Conexión a la base de datos establecida con éxito.")
-                return connection
-        except Error as e:
-            print(f'Error al conectar a la base de datos: {e}')
-            return None
+    def estadisticas(self):
+        return {
+            **self.metricas.a_dict(),
+            'pool': self.estadisticas_pool(),
+            'cache': self.estadisticas_cache(),
+        }
 
+    @medido('crear_venta')
     def crear_venta(self, venta):
+        if self._existe_en_cache(venta.dni):
+            logger.warning('Ya existe un cliente con DNI %s', venta.dni)
+            return
         try:
-            connection = self.connect()
-            if connection:
-                cursor = connection.cursor()
-                print(f'Conexión establecida, preparando para insertar venta {venta.cliente}')
-
-                cursor.execute('SELECT dni FROM Venta WHERE dni = %s', (venta.dni,))
-                if cursor.fetchone():
-                    print(f'Error: Ya existe un cliente con DNI {venta.dni}')
-                    return
-                
-                query = '''
-                    INSERT INTO Venta (dni, fecha, cliente, producto_vendido)
-                    VALUES (%s, %s, %s, %s)
-                '''
-                cursor.execute(query, (venta.dni, venta.fecha, venta.cliente, venta.producto_vendido))
-                print('Inserción en venta realizada.')
-
-                if isinstance(venta, VentaOnline):
-                    query = '''
-                        INSERT INTO VentaOnline (dni, fecha, cliente, producto_vendido, descuento_efectivo)
-                        VALUES (%s, %s, %s, %s, %s)
-                    '''
-                    cursor.execute(query, (venta.dni, venta.fecha, venta.cliente, venta.producto_vendido, venta.descuento_efectivo))
-                    print('Inserción en VentaOnline realizada.')
-                elif isinstance(venta, VentaLocal):
-                    query = '''
-                        INSERT INTO VentaLocal (dni, fecha, cliente, producto_vendido, envio_gratis)
-                        VALUES (%s, %s, %s, %s, %s)
-                    '''
-                    cursor.execute(query, (venta.dni, venta.fecha, venta.cliente, venta.producto_vendido, venta.envio_gratis))
-                    print('Inserción en VentaLocal realizada.')
-
-                connection.commit()
-                print(f'Venta {venta.cliente} creada correctamente.')
-        except Error as e:
-            print(f'Error al conectar a la base de datos: {e}')
+            logger.debug('Preparando para insertar venta %s', venta.cliente)
+            insertados, errores = self.backend.insertar_lote([(0, venta)])
+            if errores:
+                logger.warning('No se pudo crear la venta: %s', errores[0]['error'])
+                return
+            self._invalidar_cache(venta.dni)
+            logger.info('Venta %s creada correctamente.', venta.cliente)
         except Exception as e:
-            print(f'Error inesperado: {e}')
-        finally:
-            if connection and connection.is_connected():
-                connection.close()
-                print('Conexión cerrada.')
-
+            logger.error('Error al crear la venta: %s', e)
+
+    @medido('crear_ventas')
+    def crear_ventas(self, ventas, tamano_lote=None):
+        tamano_lote = tamano_lote or self.tamano_lote
+        resultado = {'insertadas': 0, 'errores': []}
+        vistos = set()
+        lote = []
+        for indice, venta in enumerate(ventas):
+            if not isinstance(venta, (VentaOnline, VentaLocal)):
+                resultado['errores'].append({'indice': indice, 'dni': getattr(venta, 'dni', None), 'error': 'Tipo de venta no soportado'})
+                continue
+            if venta.dni in vistos:
+                resultado['errores'].append({'indice': indice, 'dni': venta.dni, 'error': f'DNI {venta.dni} repetido en el lote'})
+                continue
+            if self._existe_en_cache(venta.dni):
+                resultado['errores'].append({'indice': indice, 'dni': venta.dni, 'error': f'Ya existe un cliente con DNI {venta.dni}'})
+                continue
+            vistos.add(venta.dni)
+            lote.append((indice, venta))
+            if len(lote) >= tamano_lote:
+                self._insertar_lote(lote, resultado)
+                lote = []
+        if lote:
+            self._insertar_lote(lote, resultado)
+        logger.info('Carga masiva finalizada: %s ventas insertadas, %s con errores.', resultado['insertadas'], len(resultado['errores']))
+        return resultado
+
+    def _insertar_lote(self, lote, resultado):
+        try:
+            insertados, errores = self.backend.insertar_lote(lote)
+        except Exception as e:
+            logger.error('Error al insertar el lote: %s', e)
+            for indice, venta in lote:
+                resultado['errores'].append({'indice': indice, 'dni': venta.dni, 'error': str(e)})
+            return
+        resultado['insertadas'] += len(insertados)
+        resultado['errores'].extend(errores)
+        for dni in insertados:
+            self._invalidar_cache(dni)
+
+    @medido('leer_venta')
     def leer_venta(self, dni):
+        venta = self._en_cache(dni)
+        if venta is not None:
+            return venta
         try:
-            connection = self.connect()
-            if connection:
-                with connection.cursor(dictionary=True) as cursor:
-                    cursor.execute('SELECT * FROM Venta WHERE dni = %s', (dni,))
-                    venta_data = cursor.fetchone()
-
-                    if venta_data:
-                        venta_data = {k.lower(): v for k, v in venta_data.items()}
-                        cursor.execute('SELECT * FROM VentaOnline WHERE dni = %s', (dni,))
-                        envio_gratis = cursor.fetchone()
-
-                        if envio_gratis:
-                            venta_data['descuento_efectivo'] = envio_gratis['descuento_efectivo']
-                            venta = VentaOnline(**venta_data)
-                        else:
-                            cursor.execute('SELECT * FROM VentaLocal WHERE dni = %s', (dni,))
-                            descuento_efectivo = cursor.fetchone()
-
-                            if descuento_efectivo:
-                                venta_data['envio_gratis'] = descuento_efectivo['envio_gratis']
-                                venta = VentaLocal(**venta_data)
-                            else:
-                                print(f'No se encontró información específica para el cliente con DNI {dni}.')
-                                return
-    
-                        print(f'Venta encontrado: {venta}')
-                    else:
-                        print(f'No se encontró venta con DNI {dni}.')
+            venta = self.backend.obtener([int(dni)]).get(int(dni))
+            if venta is None:
+                logger.info('No se encontró venta con DNI %s.', dni)
+                return None
+            if self.cache is not None:
+                self.cache.guardar(venta)
+            logger.debug('Venta encontrada: %s', venta)
+            return venta
         except Exception as e:
-            print(f'Error al leer ventas: {e}')
-        finally:
-            if connection and connection.is_connected():
-                connection.close()
-
-    def actualizar_venta(self, dni, campo, nuevo_valor):
+            logger.error('Error al leer ventas: %s', e)
+        return None
+
+    @medido('leer_ventas')
+    def leer_ventas(self, dnis, errores=None):
+        # Si se pasa la lista errores, los DNI que no se pudieron consultar se
+        # anotan allí para no confundirlos con ventas inexistentes.
+        ventas = {}
+        pendientes = []
+        for dni in dict.fromkeys(int(dni) for dni in dnis):
+            venta = self._en_cache(dni)
+            if venta is not None:
+                ventas[dni] = venta
+            else:
+                pendientes.append(dni)
+        for inicio in range(0, len(pendientes), self.tamano_lote):
+            bloque = pendientes[inicio:inicio + self.tamano_lote]
+            try:
+                encontradas = self.backend.obtener(bloque)
+            except Exception as e:
+                logger.error('Error al leer ventas: %s', e)
+                if errores is not None:
+                    errores.extend({'dni': dni, 'error': str(e)} for dni in bloque)
+                continue
+            ventas.update(encontradas)
+            if self.cache is not None:
+                for venta in encontradas.values():
+                    self.cache.guardar(venta)
+        return ventas
+
+    @medido('buscar_ventas')
+    def buscar_ventas(self, cliente_prefijo=None, desde=None, hasta=None, tipo=None, limite=50, despues_de=None):
+        # Devuelve {'ventas': [...], 'siguiente': cursor}; pasar el cursor como
+        # despues_de trae la página siguiente. 'siguiente' es None en la última.
+        if tipo not in (None, 'online', 'local'):
+            raise ValueError(f"Tipo de venta desconocido: {tipo}")
+        if limite < 1:
+            raise ValueError(f"El límite debe ser mayor que cero: {limite}")
+        desde = validar_cambio('fecha', desde) if desde else None
+        hasta = validar_cambio('fecha', hasta) if hasta else None
+        resultado = {'ventas': [], 'siguiente': None}
         try:
-            connection = self.connect()
-            if connection:
-                with connection.cursor() as cursor:
-                    cursor.execute('SELECT * FROM Venta WHERE dni = %s', (dni,))
-                    if not cursor.fetchone():
-                        print(f'No se encontró venta con DNI {dni}.')
-                        return
-
-                    if campo == 'producto_vendido':
-                        cursor.execute('UPDATE Venta SET producto_vendido = %s WHERE dni = %s', (nuevo_valor, dni))
-                    elif campo == 'fecha':
-                        cursor.execute('UPDATE Venta SET fecha = %s WHERE dni = %s', (nuevo_valor, dni))
-                    elif campo == 'cliente':
-                        cursor.execute('UPDATE Venta SET cliente = %s WHERE dni = %s', (nuevo_valor, dni))
-                    elif campo == 'envio_gratis':
-                        cursor.execute('UPDATE VentaLocal SET envio_gratis = %s WHERE dni = %s', (nuevo_valor, dni))
-                    elif campo == 'descuento_efectivo':
-                        cursor.execute('UPDATE VentaOnline SET descuento_efectivo = %s WHERE dni = %s', (nuevo_valor, dni))
-                    else:
-                        print(f'Campo no reconocido: {campo}')
-                        return
-
-                    connection.commit()
-                    print(f'Dato {campo} actualizado para el cliente con DNI: {dni}')
+            # Se pide una venta de más para saber si existe otra página.
+            ventas = self.backend.buscar(cliente_prefijo or None, desde, hasta, tipo, limite + 1, despues_de)
+        except Exception as e:
+            logger.error('Error al buscar ventas: %s', e)
+            return resultado
+        if len(ventas) > limite:
+            ventas = ventas[:limite]
+            resultado['siguiente'] = clave_busqueda(ventas[-1], orden_busqueda(cliente_prefijo, desde, hasta))
+        resultado['ventas'] = ventas
+        return resultado
+
+    def iterar_ventas(self, tamano_pagina=None):
+        return self.backend.iterar(tamano_pagina or self.tamano_pagina)
+
+    @medido('actualizar_ventas')
+    def actualizar_ventas(self, cambios, tamano_lote=None):
+        # cambios: iterable de (dni, {campo: valor}). Todas las modificaciones
+        # se aplican en una única transacción con UPDATE agrupados por tabla.
+        resultado = {'actualizadas': 0, 'no_encontradas': [], 'errores': []}
+        validos = {}
+        for dni, campos in cambios:
+            try:
+                validados = {campo: validar_cambio(campo, valor) for campo, valor in campos.items()}
+                validos.setdefault(int(dni), {}).update(validados)
+            except (ValueError, TypeError) as e:
+                resultado['errores'].append({'dni': dni, 'error': str(e)})
+        if not validos:
+            return resultado
+
+        # Si todas las ventas están en caché no hace falta comprobar que existan.
+        verificar = not all(self._existe_en_cache(dni) for dni in validos)
+        try:
+            actualizadas = self.backend.actualizar_lote(validos, tamano_lote or self.tamano_lote, verificar=verificar)
         except Exception as e:
-            print(f'Error al actualizar el cliente: {e}')
+            logger.error('Error al actualizar las ventas: %s', e)
+            resultado['errores'].extend({'dni': dni, 'error': str(e)} for dni in validos)
+            return resultado
         finally:
-            if connection and connection.is_connected():
-                connection.close()
+            for dni in validos:
+                self._invalidar_cache(dni)
+        resultado['actualizadas'] = len(actualizadas)
+        resultado['no_encontradas'] = [dni for dni in validos if dni not in actualizadas]
+        return resultado
 
-    def eliminar_venta(self, dni):
+    @medido('actualizar_venta')
+    def actualizar_venta(self, dni, campo, nuevo_valor):
+        if campo not in CAMPOS_ACTUALIZABLES:
+            logger.warning('Campo no reconocido: %s', campo)
+            return False
+        resultado = self.actualizar_ventas([(dni, {campo: nuevo_valor})])
+        if resultado['errores']:
+            logger.error('Error al actualizar el cliente: %s', resultado['errores'][0]['error'])
+            return False
+        if resultado['no_encontradas']:
+            logger.info('No se encontró venta con DNI %s.', dni)
+            return False
+        logger.info('Dato %s actualizado para el cliente con DNI: %s', campo, dni)
+        return True
+
+    @medido('eliminar_venta')
+    def eliminar_venta(self, dni, errores=None):
         try:
-            connection = self.connect()
-            if connection:
-                cursor = connection.cursor()
-                cursor.execute('DELETE FROM Venta WHERE dni = %s', (dni,))
-                connection.commit()
-                print(f'Venta con DNI {dni} eliminada.')
+            eliminada = self.backend.eliminar(int(dni))
+            self._invalidar_cache(dni)
+            if eliminada:
+                logger.info('Venta con DNI %s eliminada.', dni)
+            else:
+                logger.info('No se encontró venta con DNI %s.', dni)
+            return eliminada
         except Exception as e:
-            print(f'Error al eliminar venta: {e}')
-        finally:
-            if connection and connection.is_connected():
-                connection.close()
+            logger.error('Error al eliminar venta: %s', e)
+            if errores is not None:
+                errores.append({'dni': dni, 'error': str(e)})
+        return False
@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import sys
+import time
+
+from almacenamiento import crear_backend
+from clase import ProductosVendidos
+from esquema import crear_esquema, verificar_indices
+from modelos import CAMPOS_ACTUALIZABLES, VentaLocal, VentaOnline, validar_cambio
+
+COLUMNAS_CSV = ['dni', 'fecha', 'cliente', 'producto_vendido', 'tipo', 'descuento_efectivo', 'envio_gratis']
+
+def tipo_de_venta(venta):
+    if isinstance(venta, VentaOnline):
+        return 'online'
+    if isinstance(venta, VentaLocal):
+        return 'local'
+    return None
+
+
+def registro_de_venta(venta):
+    registro = venta.to_dict()
+    registro['tipo'] = tipo_de_venta(venta)
+    return registro
+
+
+def venta_desde_dict(registro, tipo_defecto=None):
+    tipo = registro.get('tipo') or tipo_defecto
+    if not tipo:
+        tipo = 'online' if registro.get('descuento_efectivo') not in (None, '') else 'local'
+    datos = (registro['dni'], registro['fecha'], registro['cliente'], registro['producto_vendido'])
+    if tipo == 'online':
+        descuento = registro.get('descuento_efectivo')
+        descuento = None if descuento in (None, '') else validar_cambio('descuento_efectivo', descuento)
+        return VentaOnline(*datos, descuento_efectivo=descuento)
+    if tipo == 'local':
+        envio = registro.get('envio_gratis')
+        envio = None if envio in (None, '') else validar_cambio('envio_gratis', envio)
+        return VentaLocal(*datos, envio_gratis=envio)
+    raise ValueError(f'Tipo de venta desconocido: {tipo}')
+
+
+def _abrir(ruta, modo, estandar):
+    if ruta == '-':
+        return contextlib.nullcontext(estandar)
+    return open(ruta, modo, encoding='utf-8', newline='')
+
+
+def _formato(ruta, formato):
+    if formato:
+        return formato
+    return 'csv' if ruta.lower().endswith('.csv') else 'jsonl'
+
+
+def leer_archivo(archivo, formato, tipo_defecto, errores):
+    # Genera las ventas de a una; las filas inválidas se anotan con su
+    # número de línea y no interrumpen la importación.
+    if formato == 'csv':
+        registros = csv.DictReader(archivo)
+        numerados = ((registros.line_num, registro) for registro in registros)
+    else:
+        numerados = ((numero, linea) for numero, linea in enumerate(archivo, start=1) if linea.strip())
+
+    for numero, registro in numerados:
+        try:
+            if formato != 'csv':
+                registro = json.loads(registro)
+            yield venta_desde_dict(registro, tipo_defecto)
+        except (ValueError, KeyError, TypeError) as e:
+            errores.append({'linea': numero, 'error': str(e)})
+
+
+def _rendimiento(filas, inicio):
+    segundos = time.perf_counter() - inicio
+    return {
+        'filas': filas,
+        'segundos': round(segundos, 4),
+        'filas_por_segundo': round(filas / segundos, 1) if segundos else 0.0,
+    }
+
+
+def comando_import(ventas, args):
+    inicio = time.perf_counter()
+    errores_lectura = []
+    with _abrir(args.archivo, 'r', sys.stdin) as archivo:
+        formato = _formato(args.archivo, args.formato)
+        resultado = ventas.crear_ventas(leer_archivo(archivo, formato, args.tipo, errores_lectura), tamano_lote=args.lote)
+    # Cada fila leída terminó insertada, rechazada por crear_ventas o inválida.
+    filas = resultado['insertadas'] + len(resultado['errores']) + len(errores_lectura)
+    return {
+        'comando': 'import',
+        'insertadas': resultado['insertadas'],
+        'errores': errores_lectura + resultado['errores'],
+        **_rendimiento(filas, inicio),
+    }
+
+
+def comando_export(ventas, args):
+    inicio = time.perf_counter()
+    filas = 0
+    with _abrir(args.archivo, 'w', args.stdout) as archivo:
+        formato = _formato(args.archivo, args.formato)
+        if formato == 'csv':
+            escritor = csv.DictWriter(archivo, fieldnames=COLUMNAS_CSV)
+            escritor.writeheader()
+            for venta in ventas.iterar_ventas(args.pagina):
+                escritor.writerow(registro_de_venta(venta))
+                filas += 1
+        else:
+            for venta in ventas.iterar_ventas(args.pagina):
+                archivo.write(json.dumps(registro_de_venta(venta)) + '\n')
+                filas += 1
+    return {'comando': 'export', 'archivo': args.archivo, **_rendimiento(filas, inicio)}
+
+
+def comando_get(ventas, args):
+    inicio = time.perf_counter()
+    errores = []
+    encontradas = ventas.leer_ventas(args.dni, errores=errores)
+    fallidos = {error['dni'] for error in errores}
+    return {
+        'comando': 'get',
+        'ventas': [registro_de_venta(encontradas[dni]) for dni in sorted(encontradas)],
+        'no_encontrados': [dni for dni in args.dni if dni not in encontradas and dni not in fallidos],
+        'errores': errores,
+        **_rendimiento(len(args.dni), inicio),
+    }
+
+
+def comando_update(ventas, args):
+    inicio = time.perf_counter()
+    # El valor llega como texto; validar_cambio lo convierte y rechaza los inválidos.
+    resultado = ventas.actualizar_ventas([(args.dni, {args.campo: args.valor})])
+    return {
+        'comando': 'update',
+        'dni': args.dni,
+        'actualizada': resultado['actualizadas'] == 1,
+        'errores': resultado['errores'],
+        **_rendimiento(1, inicio),
+    }
+
+
+def comando_delete(ventas, args):
+    inicio = time.perf_counter()
+    errores = []
+    eliminadas = [dni for dni in args.dni if ventas.eliminar_venta(dni, errores=errores)]
+    fallidos = {error['dni'] for error in errores}
+    return {
+        'comando': 'delete',
+        'eliminadas': eliminadas,
+        'no_encontrados': [dni for dni in args.dni if dni not in eliminadas and dni not in fallidos],
+        'errores': errores,
+        **_rendimiento(len(args.dni), inicio),
+    }
+
+
+def comando_schema(ventas, args):
+    inicio = time.perf_counter()
+    if not args.verificar:
+        crear_esquema(ventas.backend)
+    faltantes = verificar_indices(ventas.backend)
+    return {
+        'comando': 'schema',
+        'errores': [f'Falta el índice {nombre} sobre {tabla}.{columna}' for tabla, nombre, columna in faltantes],
+        **_rendimiento(0, inicio),
+    }
+
+
+def _imprimir_texto(resultado, salida):
+    for clave, valor in resultado.items():
+        if isinstance(valor, list):
+            print(f'{clave}: {len(valor)}', file=salida)
+            for elemento in valor:
+                print(f'  {elemento}', file=salida)
+        elif clave not in ('segundos', 'filas_por_segundo'):
+            print(f'{clave}: {valor}', file=salida)
+    print(f"{resultado['filas']} filas en {resultado['segundos']} s ({resultado['filas_por_segundo']} filas/s)", file=salida)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog='main.py', description='Operaciones no interactivas sobre las ventas.')
+    parser.add_argument('--json', action='store_true', help='salida en JSON para procesar con otras herramientas')
+    parser.add_argument('--backend', help='backend de almacenamiento (mysql, sqlite, jsonl); por defecto DB_BACKEND')
+    parser.add_argument('--metricas', metavar='ARCHIVO', help="guarda las métricas de latencia en JSON ('-' para stderr)")
+    parser.add_argument('-v', '--verbose', action='store_true', help='muestra los mensajes informativos')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    importar = subparsers.add_parser('import', help='importa ventas desde CSV o JSON lines')
+    importar.add_argument('archivo', help="ruta del archivo o '-' para stdin")
+    importar.add_argument('--formato', choices=['csv', 'jsonl'])
+    importar.add_argument('--tipo', choices=['online', 'local'], help='tipo para las filas que no lo indican')
+    importar.add_argument('--lote', type=int, help='ventas por transacción (por defecto DB_BATCH_SIZE)')
+    importar.set_defaults(funcion=comando_import)
+
+    exportar = subparsers.add_parser('export', help='exporta todas las ventas')
+    exportar.add_argument('archivo', help="ruta del archivo o '-' para stdout")
+    exportar.add_argument('--formato', choices=['csv', 'jsonl'])
+    exportar.add_argument('--pagina', type=int, help='filas por página (por defecto DB_PAGE_SIZE)')
+    exportar.set_defaults(funcion=comando_export)
+
+    obtener = subparsers.add_parser('get', help='busca ventas por DNI')
+    obtener.add_argument('dni', type=int, nargs='+')
+    obtener.set_defaults(funcion=comando_get)
+
+    actualizar = subparsers.add_parser('update', help='actualiza un campo de una venta')
+    actualizar.add_argument('dni', type=int)
+    actualizar.add_argument('campo', choices=list(CAMPOS_ACTUALIZABLES))
+    actualizar.add_argument('valor')
+    actualizar.set_defaults(funcion=comando_update)
+
+    eliminar = subparsers.add_parser('delete', help='elimina ventas por DNI')
+    eliminar.add_argument('dni', type=int, nargs='+')
+    eliminar.set_defaults(funcion=comando_delete)
+
+    esquema = subparsers.add_parser('schema', help='crea o migra las tablas, índices y claves foráneas')
+    esquema.add_argument('--verificar', action='store_true', help='sólo comprueba que existan los índices')
+    esquema.set_defaults(funcion=comando_schema)
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    args.stdout = salida = sys.stdout
+    # Los mensajes de ProductosVendidos van por logging a stderr para no
+    # mezclarse con los resultados ni con un export escrito en stdout.
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(levelname)s %(name)s: %(message)s', stream=sys.stderr)
+    ventas = ProductosVendidos(backend=crear_backend(args.backend))
+    try:
+        resultado = args.funcion(ventas, args)
+    finally:
+        ventas.cerrar()
+    if args.metricas:
+        with _abrir(args.metricas, 'w', sys.stderr) as archivo:
+            archivo.write(json.dumps(ventas.estadisticas(), indent=4) + '\n')
+
+    if args.comando == 'export' and args.archivo == '-':
+        salida = sys.stderr
+    if args.json:
+        print(json.dumps(resultado, default=str), file=salida)
+    else:
+        _imprimir_texto(resultado, salida)
+    return 1 if resultado.get('errores') else 0
@@ -0,0 +1,226 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# DDL por dialecto, en orden de creación: las subtablas referencian a Venta.
+TABLAS = {
+    'mysql': {
+        'Venta': '''
+            CREATE TABLE IF NOT EXISTS Venta (
+                dni INT NOT NULL PRIMARY KEY,
+                fecha DATE NOT NULL,
+                cliente VARCHAR(100) NOT NULL,
+                producto_vendido INT NOT NULL,
+                INDEX idx_venta_fecha (fecha),
+                INDEX idx_venta_cliente (cliente)
+            ) ENGINE=InnoDB
+        ''',
+        'VentaOnline': '''
+            CREATE TABLE IF NOT EXISTS VentaOnline (
+                dni INT NOT NULL PRIMARY KEY,
+                fecha DATE NOT NULL,
+                cliente VARCHAR(100) NOT NULL,
+                producto_vendido INT NOT NULL,
+                descuento_efectivo DECIMAL(10, 2) NOT NULL,
+                CONSTRAINT fk_ventaonline_venta FOREIGN KEY (dni) REFERENCES Venta (dni) ON DELETE CASCADE
+            ) ENGINE=InnoDB
+        ''',
+        'VentaLocal': '''
+            CREATE TABLE IF NOT EXISTS VentaLocal (
+                dni INT NOT NULL PRIMARY KEY,
+                fecha DATE NOT NULL,
+                cliente VARCHAR(100) NOT NULL,
+                producto_vendido INT NOT NULL,
+                envio_gratis BOOLEAN NOT NULL,
+                CONSTRAINT fk_ventalocal_venta FOREIGN KEY (dni) REFERENCES Venta (dni) ON DELETE CASCADE
+            ) ENGINE=InnoDB
+        ''',
+    },
+    'sqlite': {
+        'Venta': '''
+            CREATE TABLE IF NOT EXISTS Venta (
+                dni INTEGER PRIMARY KEY,
+                fecha DATE NOT NULL,
+                cliente TEXT NOT NULL,
+                producto_vendido INTEGER NOT NULL
+            )
+        ''',
+        'VentaOnline': '''
+            CREATE TABLE IF NOT EXISTS VentaOnline (
+                dni INTEGER PRIMARY KEY REFERENCES Venta (dni) ON DELETE CASCADE,
+                fecha DATE NOT NULL,
+                cliente TEXT NOT NULL,
+                producto_vendido INTEGER NOT NULL,
+                descuento_efectivo REAL NOT NULL
+            )
+        ''',
+        'VentaLocal': '''
+            CREATE TABLE IF NOT EXISTS VentaLocal (
+                dni INTEGER PRIMARY KEY REFERENCES Venta (dni) ON DELETE CASCADE,
+                fecha DATE NOT NULL,
+                cliente TEXT NOT NULL,
+                producto_vendido INTEGER NOT NULL,
+                envio_gratis INTEGER NOT NULL
+            )
+        ''',
+    },
+}
+
+COLUMNAS = {
+    'VentaOnline': 'dni, fecha, cliente, producto_vendido, descuento_efectivo',
+    'VentaLocal': 'dni, fecha, cliente, producto_vendido, envio_gratis',
+}
+
+# (tabla, nombre, columna): índices secundarios que necesitan las búsquedas
+# por rango de fechas y por prefijo de cliente.
+INDICES = (
+    ('Venta', 'idx_venta_fecha', 'fecha'),
+    ('Venta', 'idx_venta_cliente', 'cliente'),
+)
+
+# LIKE no distingue mayúsculas en SQLite; sólo usa el índice si éste
+# también ignora mayúsculas.
+COLACION_INDICE = {
+    ('sqlite', 'cliente'): ' COLLATE NOCASE',
+}
+
+
+def _columnas_indexadas(backend, cursor):
+    # Devuelve {(tabla, columna)} para las columnas que encabezan algún índice.
+    if backend.dialecto == 'sqlite':
+        indexadas = set()
+        for tabla in TABLAS['sqlite']:
+            for indice in backend.consultar(cursor, f'PRAGMA index_list({tabla})'):
+                columnas = backend.consultar(cursor, f"PRAGMA index_info('{indice[1]}')")
+                if columnas:
+                    indexadas.add((tabla.lower(), columnas[0][2].lower()))
+        return indexadas
+    filas = backend.consultar(cursor, '''
+        SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND SEQ_IN_INDEX = 1
+    ''')
+    return {(tabla.lower(), columna.lower()) for tabla, columna in filas}
+
+
+def _tablas_con_cascada(backend, cursor):
+    if backend.dialecto == 'sqlite':
+        return {
+            tabla.lower() for tabla in COLUMNAS
+            if any(clave[2] == 'Venta' and clave[6] == 'CASCADE' for clave in backend.consultar(cursor, f'PRAGMA foreign_key_list({tabla})'))
+        }
+    filas = backend.consultar(cursor, '''
+        SELECT TABLE_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME = 'Venta' AND DELETE_RULE = 'CASCADE'
+    ''')
+    return {fila[0].lower() for fila in filas}
+
+
+def _tablas_existentes(backend, cursor):
+    if backend.dialecto == 'sqlite':
+        filas = backend.consultar(cursor, "SELECT name FROM sqlite_master WHERE type = 'table'")
+    else:
+        filas = backend.consultar(cursor, 'SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE()')
+    return {fila[0].lower() for fila in filas}
+
+
+def _crear_indices(backend, cursor, tablas):
+    indexadas = _columnas_indexadas(backend, cursor)
+    for tabla, nombre, columna in INDICES:
+        if tabla in tablas and (tabla.lower(), columna) not in indexadas:
+            colacion = COLACION_INDICE.get((backend.dialecto, columna), '')
+            backend.ejecutar(cursor, f'CREATE INDEX {nombre} ON {tabla} ({columna}{colacion})')
+            logger.info('Índice %s creado.', nombre)
+
+
+def _agregar_cascada(backend, cursor, tabla):
+    # Las filas huérfanas (restos de bajas anteriores) impedirían crear la
+    # clave foránea, así que se descartan primero.
+    backend.ejecutar(cursor, f'DELETE FROM {tabla} WHERE dni NOT IN (SELECT dni FROM Venta)')
+    if cursor.rowcount:
+        logger.warning('Se descartaron %s filas huérfanas de %s.', cursor.rowcount, tabla)
+    if backend.dialecto == 'sqlite':
+        # SQLite no permite agregar claves foráneas a una tabla existente:
+        # se reconstruye copiando los datos.
+        backend.ejecutar(cursor, f'ALTER TABLE {tabla} RENAME TO {tabla}_anterior')
+        backend.ejecutar(cursor, TABLAS['sqlite'][tabla])
+        backend.ejecutar(cursor, f'INSERT INTO {tabla} ({COLUMNAS[tabla]}) SELECT {COLUMNAS[tabla]} FROM {tabla}_anterior')
+        backend.ejecutar(cursor, f'DROP TABLE {tabla}_anterior')
+    else:
+        # Una clave foránea previa sobre dni sin cascada chocaría con la nueva
+        # (o dejaría dos restricciones): se eliminan antes de agregarla.
+        anteriores = backend.consultar(cursor, '''
+            SELECT DISTINCT CONSTRAINT_NAME FROM information_schema.KEY_COLUMN_USAGE
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'dni'
+            AND REFERENCED_TABLE_NAME = 'Venta'
+        ''', (tabla,))
+        for nombre, in anteriores:
+            backend.ejecutar(cursor, f'ALTER TABLE {tabla} DROP FOREIGN KEY `{nombre}`')
+            logger.info('Clave foránea %s de %s eliminada.', nombre, tabla)
+        backend.ejecutar(cursor, f'''
+            ALTER TABLE {tabla} ADD CONSTRAINT fk_{tabla.lower()}_venta
+            FOREIGN KEY (dni) REFERENCES Venta (dni) ON DELETE CASCADE
+        ''')
+    logger.info('Clave foránea con ON DELETE CASCADE agregada a %s.', tabla)
+
+
+def crear_esquema(backend):
+    # Crea las tablas que falten y migra las existentes: índices secundarios y
+    # claves foráneas en cascada. Es idempotente. Los almacenes sin esquema
+    # (JSON lines) no requieren nada.
+    if getattr(backend, 'dialecto', None) is None:
+        return
+    connection = backend._conexion()
+    try:
+        cursor = backend.cursor(connection)
+        for ddl in TABLAS[backend.dialecto].values():
+            backend.ejecutar(cursor, ddl)
+        con_cascada = _tablas_con_cascada(backend, cursor)
+        for tabla in COLUMNAS:
+            if tabla.lower() not in con_cascada:
+                _agregar_cascada(backend, cursor, tabla)
+        _crear_indices(backend, cursor, TABLAS[backend.dialecto])
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        backend.liberar(connection)
+
+
+def crear_tablas(backend):
+    # Sólo crea las tablas que faltan, con sus índices; las existentes no se
+    # tocan. Es lo que se hace al abrir un almacén: la migración de tablas
+    # anteriores (que descarta filas huérfanas) queda para crear_esquema.
+    if getattr(backend, 'dialecto', None) is None:
+        return
+    connection = backend._conexion()
+    try:
+        cursor = backend.cursor(connection)
+        existentes = _tablas_existentes(backend, cursor)
+        nuevas = [tabla for tabla in TABLAS[backend.dialecto] if tabla.lower() not in existentes]
+        for tabla in nuevas:
+            backend.ejecutar(cursor, TABLAS[backend.dialecto][tabla])
+        if nuevas:
+            _crear_indices(backend, cursor, nuevas)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        backend.liberar(connection)
+
+
+def verificar_indices(backend):
+    # Devuelve los índices de INDICES ausentes; sin ellos las consultas por
+    # fecha o por cliente recorren la tabla completa.
+    if getattr(backend, 'dialecto', None) is None:
+        return []
+    connection = backend._conexion()
+    try:
+        indexadas = _columnas_indexadas(backend, backend.cursor(connection))
+    finally:
+        backend.liberar(connection)
+    faltantes = [(tabla, nombre, columna) for tabla, nombre, columna in INDICES if (tabla.lower(), columna) not in indexadas]
+    for tabla, nombre, columna in faltantes:
+        logger.warning('Falta el índice %s sobre %s.%s: las consultas por %s recorrerán toda la tabla.', nombre, tabla, columna, columna)
+    return faltantes
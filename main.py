@@ -1,5 +1,7 @@
+import logging
 import os
 import platform
+import sys
 from clase import VentaLocal, VentaOnline, ProductosVendidos
 
 def limpiar_pantalla():
@@ -16,7 +18,8 @@ def mostrar_menu():
     print("4. Actualizar Cliente")
     print("5. Eliminar Cliente por DNI")
     print("6. Mostrar todos los clientes")
-    print("7. Salir")
+    print("7. Buscar ventas por cliente, fecha o tipo")
+    print("8. Salir")
     print("=============================================")
 
 def agregar_venta(ventas, tipo_venta):
@@ -81,30 +84,49 @@ def actualizar_venta(ventas):
 def eliminar_cliente(ventas):
     dni = input("Ingrese el DNI del cliente a eliminar: ")
     ventas.eliminar_venta(dni)  
-    print(f'Venta con DNI {dni} eliminada.')
     input('Presione enter para continuar...')
 
 def mostrar_clientes(ventas):
     try:
-        connection = ventas.connect()
-        if connection:
-            with connection.cursor(dictionary=True) as cursor:
-                cursor.execute('SELECT * FROM Venta')
-                resultados = cursor.fetchall()
-                if resultados:
-                    print("Clientes registrados:")
-                    for row in resultados:
-                        print(row)
-                else:
-                    print("No hay clientes registrados.")
+        hay_clientes = False
+        for venta in ventas.iterar_ventas():
+            if not hay_clientes:
+                print("Clientes registrados:")
+                hay_clientes = True
+            print(venta.to_dict())
+        if not hay_clientes:
+            print("No hay clientes registrados.")
     except Exception as e:
         print(f'Error al mostrar clientes: {e}')
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
+    input('Presione enter para continuar...')
+
+def buscar_ventas(ventas):
+    try:
+        cliente = input('Apellido y nombre (o su comienzo, Enter para omitir): ').strip()
+        desde = input('Desde la fecha (YYYY-MM-DD, Enter para omitir): ').strip()
+        hasta = input('Hasta la fecha (YYYY-MM-DD, Enter para omitir): ').strip()
+        tipo = {'1': 'online', '2': 'local'}.get(input('Tipo: 1. Página web, 2. Local, Enter para ambos: ').strip())
+        despues_de = None
+        while True:
+            resultado = ventas.buscar_ventas(cliente, desde, hasta, tipo, limite=20, despues_de=despues_de)
+            if not resultado['ventas'] and despues_de is None:
+                print("No se encontraron ventas.")
+            for venta in resultado['ventas']:
+                print(venta.to_dict())
+            despues_de = resultado['siguiente']
+            if despues_de is None or input('Enter para ver más, q para terminar: ').strip().lower() == 'q':
+                break
+    except ValueError as e:
+        print(f'Error: {e}')
     input('Presione enter para continuar...')
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Con argumentos se ejecuta en modo no interactivo (ver cli.py).
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     ventas = ProductosVendidos()
     
     while True:
@@ -123,6 +145,8 @@ if __name__ == "__main__":
         elif opcion == '6':
             mostrar_clientes(ventas)
         elif opcion == '7':
+            buscar_ventas(ventas)
+        elif opcion == '8':
             break
         else:
             print('Opción no válida.')
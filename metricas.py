@@ -0,0 +1,139 @@
+import bisect
+import contextlib
+import functools
+import json
+import logging
+import re
+import time
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (en milisegundos) de las cubetas de los histogramas.
+LIMITES_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histograma:
+    def __init__(self, limites=LIMITES_MS):
+        self.limites = limites
+        self.cubetas = [0] * (len(limites) + 1)
+        self.cantidad = 0
+        self.total_ms = 0.0
+        self.minimo_ms = None
+        self.maximo_ms = 0.0
+
+    def registrar(self, ms):
+        self.cubetas[bisect.bisect_left(self.limites, ms)] += 1
+        self.cantidad += 1
+        self.total_ms += ms
+        if self.minimo_ms is None or ms < self.minimo_ms:
+            self.minimo_ms = ms
+        if ms > self.maximo_ms:
+            self.maximo_ms = ms
+
+    def percentil(self, p):
+        # Aproximado: límite superior de la cubeta que contiene el percentil.
+        if not self.cantidad:
+            return 0.0
+        objetivo = p / 100 * self.cantidad
+        acumulado = 0
+        for indice, cantidad in enumerate(self.cubetas):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return self.limites[indice] if indice < len(self.limites) else self.maximo_ms
+        return self.maximo_ms
+
+    def a_dict(self):
+        return {
+            'cantidad': self.cantidad,
+            'total_ms': round(self.total_ms, 3),
+            'promedio_ms': round(self.total_ms / self.cantidad, 3) if self.cantidad else 0.0,
+            'minimo_ms': round(self.minimo_ms or 0.0, 3),
+            'maximo_ms': round(self.maximo_ms, 3),
+            'p50_ms': self.percentil(50),
+            'p90_ms': self.percentil(90),
+            'p99_ms': self.percentil(99),
+            'cubetas': {
+                (f'<={limite}' if indice < len(self.limites) else f'>{self.limites[-1]}'): cantidad
+                for indice, (limite, cantidad) in enumerate(zip(self.limites + (None,), self.cubetas))
+                if cantidad
+            },
+        }
+
+
+def normalizar_sql(query):
+    # Agrupa las variantes de una misma sentencia: espacios colapsados y
+    # listas IN (%s, %s, ...) de cualquier largo reducidas a IN (...).
+    query = re.sub(r'\s+', ' ', query).strip()
+    return re.sub(r'IN \((?:(?:%s|\?)(?:, )?)+\)', 'IN (...)', query)
+
+
+class Instrumentacion:
+    def __init__(self, habilitada=None, umbral_lento_ms=None):
+        self.habilitada = config('METRICAS_HABILITADAS', default=True, cast=bool) if habilitada is None else habilitada
+        self.umbral_lento_ms = config('DB_SLOW_QUERY_MS', default=200.0, cast=float) if umbral_lento_ms is None else umbral_lento_ms
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.metodos = {}
+        self.consultas = {}
+        self.consultas_lentas = 0
+
+    @contextlib.contextmanager
+    def medir(self, nombre):
+        if not self.habilitada:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            histograma = self.metodos.get(nombre)
+            if histograma is None:
+                histograma = self.metodos[nombre] = Histograma()
+            histograma.registrar(ms)
+
+    def registrar_consulta(self, query, segundos, filas):
+        if not self.habilitada:
+            return
+        ms = segundos * 1000
+        clave = normalizar_sql(query)
+        consulta = self.consultas.get(clave)
+        if consulta is None:
+            consulta = self.consultas[clave] = {'histograma': Histograma(), 'filas': 0}
+        consulta['histograma'].registrar(ms)
+        if filas is not None and filas > 0:
+            consulta['filas'] += filas
+        if ms >= self.umbral_lento_ms:
+            self.consultas_lentas += 1
+            logger.warning('Consulta lenta (%.1f ms, %s filas): %s', ms, filas, clave)
+
+    def a_dict(self):
+        return {
+            'umbral_lento_ms': self.umbral_lento_ms,
+            'consultas_lentas': self.consultas_lentas,
+            'metodos': {nombre: histograma.a_dict() for nombre, histograma in sorted(self.metodos.items())},
+            'consultas': {
+                clave: {**consulta['histograma'].a_dict(), 'filas': consulta['filas']}
+                for clave, consulta in sorted(self.consultas.items(), key=lambda item: -item[1]['histograma'].total_ms)
+            },
+        }
+
+    def a_json(self, indent=None):
+        return json.dumps(self.a_dict(), indent=indent)
+
+
+# Instancia compartida por defecto, igual que un logger de módulo.
+METRICAS = Instrumentacion()
+
+
+def medido(nombre):
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(self, *args, **kwargs):
+            with self.metricas.medir(nombre):
+                return funcion(self, *args, **kwargs)
+        return envoltura
+    return decorador
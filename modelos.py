@@ -0,0 +1,205 @@
+import datetime
+import functools
+
+
+# Tabla en la que vive cada campo actualizable.
+CAMPOS_ACTUALIZABLES = {
+    'producto_vendido': 'Venta',
+    'fecha': 'Venta',
+    'cliente': 'Venta',
+    'envio_gratis': 'VentaLocal',
+    'descuento_efectivo': 'VentaOnline',
+}
+
+# Reglas de los campos derivados; las consultas de actualización masiva las
+# reciben como parámetros para recalcularlos en la misma sentencia.
+UNIDADES_BENEFICIO = 2
+TASA_DESCUENTO_ONLINE = 0.10
+
+
+@functools.lru_cache(maxsize=4096)
+def parsear_fecha(fecha_str):
+    # Las ventas se concentran en pocas fechas distintas, así que cachear el
+    # resultado evita repetir strptime en cada construcción.
+    return datetime.datetime.strptime(fecha_str, '%Y-%m-%d').date()
+
+
+# Textos aceptados para envio_gratis (entrada por consola o CSV).
+VERDADEROS = ('1', 'true', 'si', 'sí')
+FALSOS = ('0', 'false', 'no')
+
+
+def validar_cambio(campo, valor):
+    if campo not in CAMPOS_ACTUALIZABLES:
+        raise ValueError(f"Campo no reconocido: {campo}")
+    if campo == 'producto_vendido':
+        try:
+            return int(valor)
+        except (ValueError, TypeError):
+            raise ValueError("La cantidad ingresada no es correcta")
+    if campo == 'fecha':
+        if isinstance(valor, datetime.date):
+            return valor
+        try:
+            return parsear_fecha(valor)
+        except (ValueError, TypeError):
+            raise ValueError("Formato de fecha incorrecto. Debe ser YYYY-MM-DD.")
+    if campo == 'envio_gratis':
+        if isinstance(valor, str):
+            valor = valor.strip().lower()
+            if valor in VERDADEROS:
+                return True
+            if valor in FALSOS:
+                return False
+        elif valor in (0, 1):
+            return bool(valor)
+        raise ValueError("Envío gratis debe ser 1/0, sí/no o true/false")
+    if campo == 'descuento_efectivo':
+        try:
+            return float(valor)
+        except (ValueError, TypeError):
+            raise ValueError("El descuento ingresado no es correcto")
+    return valor
+
+
+class Venta:
+    __slots__ = ('__dni', '__fecha', '__cliente', '__producto_vendido')
+
+    def __init__(self, dni, fecha, cliente, producto_vendido):
+        self.__dni = self.validar_dni(dni)
+        self.__fecha = self.validar_fecha(fecha)
+        self.__cliente = cliente  
+        self.__producto_vendido = self.validar_producto(producto_vendido)
+
+    @classmethod
+    def desde_db(cls, dni, fecha, cliente, producto_vendido):
+        # Construcción sin validar para filas que ya pasaron por la base de datos.
+        venta = object.__new__(cls)
+        venta.__dni = dni
+        venta.__fecha = fecha if isinstance(fecha, datetime.date) else parsear_fecha(fecha)
+        venta.__cliente = cliente
+        venta.__producto_vendido = producto_vendido
+        return venta
+
+    @property
+    def dni(self):
+        return self.__dni
+    
+    @property
+    def fecha(self):
+        return self.__fecha
+    
+    @property
+    def cliente(self):
+        return self.__cliente
+    
+    @property
+    def producto_vendido(self):
+        return self.__producto_vendido
+    
+    def validar_fecha(self, fecha_str):
+        if isinstance(fecha_str, datetime.date):
+            return fecha_str
+        try:
+            return parsear_fecha(fecha_str)
+        except ValueError:
+            raise ValueError("Formato de fecha incorrecto. Debe ser YYYY-MM-DD.")
+
+    def validar_producto(self, producto):
+        try:
+            cantidad_producto = int(producto)
+            return cantidad_producto
+        except ValueError:
+            raise ValueError("La cantidad ingresada no es correcta")
+        
+    def validar_dni(self, dni):
+        if type(dni) is int and 1000000 <= dni <= 99999999:
+            return dni
+        try:
+            dni_num = int(dni)
+            if len(str(dni)) not in [7, 8]:
+                raise ValueError("El DNI debe tener 7 u 8 dígitos")
+            if dni_num <= 0:
+                raise ValueError("El DNI debe ser un número positivo")
+            return dni_num
+        except ValueError:
+            raise ValueError("El DNI debe ser numérico y estar compuesto por 7 u 8 dígitos")
+            
+    def to_dict(self):
+        return {
+            "dni": self.dni,
+            "fecha": str(self.fecha),
+            "cliente": self.cliente,
+            "producto_vendido": self.producto_vendido,
+        }
+
+    def __str__(self):
+        return f"{self.fecha} {self.cliente}"  
+    
+
+class VentaOnline(Venta):
+    __slots__ = ('__descuento_efectivo',)
+
+    def __init__(self, dni, fecha, cliente, producto_vendido, descuento_efectivo=None):
+        super().__init__(dni, fecha, cliente, producto_vendido)
+        if descuento_efectivo is None:
+            descuento_efectivo = self.calcular_descuento()
+        self.__descuento_efectivo = descuento_efectivo
+
+    @classmethod
+    def desde_db(cls, dni, fecha, cliente, producto_vendido, descuento_efectivo=None):
+        venta = super().desde_db(dni, fecha, cliente, producto_vendido)
+        if descuento_efectivo is None:
+            descuento_efectivo = venta.calcular_descuento()
+        venta.__descuento_efectivo = descuento_efectivo
+        return venta
+
+    @property
+    def descuento_efectivo(self):
+        return self.__descuento_efectivo
+
+    def calcular_descuento(self):
+        if self.producto_vendido > UNIDADES_BENEFICIO:
+            return self.producto_vendido * TASA_DESCUENTO_ONLINE
+        return 0
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["descuento_efectivo"] = self.descuento_efectivo
+        return data
+
+    def __str__(self):
+        return f"{super().__str__()} - Descuento: {self.descuento_efectivo}"
+    
+
+class VentaLocal(Venta):
+    __slots__ = ('__envio_gratis',)
+
+    def __init__(self, dni, fecha, cliente, producto_vendido, envio_gratis=None):
+        super().__init__(dni, fecha, cliente, producto_vendido)
+        if envio_gratis is None:
+            envio_gratis = self.calcular_envio_gratis()
+        self.__envio_gratis = envio_gratis
+
+    @classmethod
+    def desde_db(cls, dni, fecha, cliente, producto_vendido, envio_gratis=None):
+        venta = super().desde_db(dni, fecha, cliente, producto_vendido)
+        if envio_gratis is None:
+            envio_gratis = venta.calcular_envio_gratis()
+        venta.__envio_gratis = envio_gratis
+        return venta
+
+    @property
+    def envio_gratis(self):
+        return self.__envio_gratis
+
+    def calcular_envio_gratis(self):
+        return self.producto_vendido > UNIDADES_BENEFICIO
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["envio_gratis"] = self.envio_gratis
+        return data
+
+    def __str__(self):
+        return f"{super().__str__()} - Envío gratis: {self.envio_gratis}"
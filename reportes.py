@@ -0,0 +1,253 @@
+import array
+import datetime
+import itertools
+from collections import defaultdict
+
+from almacenamiento import CONSULTA_VENTAS, BackendJSONL, BackendSQL
+from modelos import VentaLocal, VentaOnline, parsear_fecha
+
+CANAL_ONLINE = 0
+CANAL_LOCAL = 1
+CANALES = {CANAL_ONLINE: 'online', CANAL_LOCAL: 'local'}
+
+
+def _a_fecha(valor):
+    return valor if isinstance(valor, datetime.date) else parsear_fecha(valor)
+
+
+COLUMNAS = ('dni', 'fecha', 'unidades', 'canal', 'descuento', 'envio_gratis')
+
+
+class ReporteVentas:
+    def __init__(self):
+        # Una columna por atributo: las fechas se guardan como ordinales para
+        # que todo el reporte viva en arrays de tipos primitivos.
+        self.dni = array.array('q')
+        self.fecha = array.array('l')
+        self.unidades = array.array('l')
+        self.canal = array.array('b')
+        self.descuento = array.array('d')
+        self.envio_gratis = array.array('b')
+        self.marca_agua = None
+        self._posiciones = {}
+
+    def __len__(self):
+        return len(self.dni)
+
+    def agregar(self, dni, fecha, producto_vendido, canal, descuento_efectivo=0.0, envio_gratis=False):
+        # Una venta ya cargada se reemplaza en su lugar con los datos nuevos.
+        dni = int(dni)
+        fecha = _a_fecha(fecha)
+        valores = (fecha.toordinal(), int(producto_vendido), canal, float(descuento_efectivo or 0.0), 1 if envio_gratis else 0)
+        posicion = self._posiciones.get(dni)
+        if posicion is None:
+            self._posiciones[dni] = len(self.dni)
+            self.dni.append(dni)
+            for nombre, valor in zip(COLUMNAS[1:], valores):
+                getattr(self, nombre).append(valor)
+        else:
+            for nombre, valor in zip(COLUMNAS[1:], valores):
+                getattr(self, nombre)[posicion] = valor
+        if self.marca_agua is None or fecha > self.marca_agua:
+            self.marca_agua = fecha
+        return True
+
+    def quitar(self, dnis):
+        quitar = {int(dni) for dni in dnis} & self._posiciones.keys()
+        if not quitar:
+            return 0
+        conservar = [indice for indice, dni in enumerate(self.dni) if dni not in quitar]
+        for nombre in COLUMNAS:
+            columna = getattr(self, nombre)
+            setattr(self, nombre, array.array(columna.typecode, (columna[indice] for indice in conservar)))
+        self._posiciones = {dni: indice for indice, dni in enumerate(self.dni)}
+        self.marca_agua = datetime.date.fromordinal(max(self.fecha)) if self.fecha else None
+        return len(quitar)
+
+    def cargar_ventas(self, ventas):
+        agregadas = 0
+        for venta in ventas:
+            if isinstance(venta, VentaOnline):
+                agregadas += self.agregar(venta.dni, venta.fecha, venta.producto_vendido, CANAL_ONLINE, venta.descuento_efectivo)
+            elif isinstance(venta, VentaLocal):
+                agregadas += self.agregar(venta.dni, venta.fecha, venta.producto_vendido, CANAL_LOCAL, 0.0, venta.envio_gratis)
+        return agregadas
+
+    def sincronizar(self, ventas):
+        # Para fuentes que se leen completas: carga todas las ventas y quita
+        # del reporte las que ya no están.
+        vistas = set()
+
+        def registrar(ventas):
+            for venta in ventas:
+                vistas.add(venta.dni)
+                yield venta
+
+        agregadas = self.cargar_ventas(registrar(ventas))
+        self.quitar(self._posiciones.keys() - vistas)
+        return agregadas
+
+    def _agregar_filas(self, filas):
+        agregadas = 0
+        for fila in filas:
+            if fila['es_online']:
+                agregadas += self.agregar(fila['dni'], fila['fecha'], fila['producto_vendido'], CANAL_ONLINE, fila['descuento_efectivo'])
+            elif fila['es_local']:
+                agregadas += self.agregar(fila['dni'], fila['fecha'], fila['producto_vendido'], CANAL_LOCAL, 0.0, fila['envio_gratis'])
+        return agregadas
+
+    def cargar_desde_db(self, ventas, tamano_pagina=None, completo=False):
+        # Refresco incremental: se releen las ventas desde la marca de agua
+        # (incluida, pueden haber llegado ventas nuevas de ese día) y se
+        # concilian los DNI para quitar las bajas y traer las altas con fecha
+        # anterior. Las modificaciones de ventas anteriores a la marca sólo se
+        # ven con completo=True, que relee todo.
+        tamano_pagina = tamano_pagina or ventas.tamano_pagina
+        backend = ventas.backend
+        if not isinstance(backend, BackendSQL):
+            return self.sincronizar(backend.iterar(tamano_pagina))
+
+        desde = datetime.date.min if completo or self.marca_agua is None else self.marca_agua
+        agregadas = 0
+        connection = backend.connect()
+        if not connection:
+            return agregadas
+        try:
+            existentes = None
+            if self._posiciones:
+                # Sólo viajan enteros y la consulta se resuelve con las claves primarias.
+                filas = backend.consultar(backend.cursor(connection), '''
+                    SELECT v.dni FROM Venta v
+                    LEFT JOIN VentaOnline o ON o.dni = v.dni
+                    LEFT JOIN VentaLocal l ON l.dni = v.dni
+                    WHERE o.dni IS NOT NULL OR l.dni IS NOT NULL
+                ''')
+                existentes = {fila[0] for fila in filas}
+
+            cursor = backend.cursor(connection, diccionario=True)
+            backend.ejecutar(cursor, CONSULTA_VENTAS + ' WHERE v.fecha >= %s', (desde,))
+            while True:
+                filas = cursor.fetchmany(tamano_pagina)
+                if not filas:
+                    break
+                agregadas += self._agregar_filas(filas)
+
+            if existentes is not None:
+                self.quitar(self._posiciones.keys() - existentes)
+                atrasadas = list(existentes - self._posiciones.keys())
+                for inicio in range(0, len(atrasadas), tamano_pagina):
+                    bloque = atrasadas[inicio:inicio + tamano_pagina]
+                    filas = backend.consultar(cursor, CONSULTA_VENTAS + f' WHERE v.dni IN ({backend._marcadores(len(bloque))})', bloque)
+                    agregadas += self._agregar_filas(filas)
+        finally:
+            backend.liberar(connection)
+        return agregadas
+
+    def cargar_desde_json(self, ruta='ventas_db.json'):
+        # BackendJSONL entiende ambos formatos y aplica modificaciones y bajas;
+        # el archivo se lee completo, así que el reporte queda sincronizado.
+        return self.sincronizar(BackendJSONL(ruta).iterar(None))
+
+    def unidades_por_dia(self):
+        # La biblioteca estándar no tiene sumas agrupadas vectorizadas: esto
+        # recorre las columnas en Python. Para volúmenes grandes resumen_sql
+        # resuelve lo mismo con GROUP BY en la base.
+        totales = defaultdict(int)
+        for fecha, unidades in zip(self.fecha, self.unidades):
+            totales[fecha] += unidades
+        return {datetime.date.fromordinal(fecha): total for fecha, total in sorted(totales.items())}
+
+    def unidades_por_mes(self):
+        return _agrupar_por_mes(self.unidades_por_dia())
+
+    def total_descuento(self):
+        return sum(self.descuento)
+
+    def envio_gratis_por_canal(self):
+        # count, sum y compress recorren los arrays en C: el canal local vale 1
+        # y sirve directamente de selector.
+        locales = self.canal.count(CANAL_LOCAL)
+        envios_local = sum(itertools.compress(self.envio_gratis, self.canal))
+        envios_online = sum(self.envio_gratis) - envios_local
+        return _resumen_canales([len(self) - locales, locales], [envios_online, envios_local])
+
+    def resumen(self):
+        return {
+            'ventas': len(self),
+            'marca_agua': str(self.marca_agua) if self.marca_agua else None,
+            'unidades_por_mes': self.unidades_por_mes(),
+            'total_descuento': self.total_descuento(),
+            'envio_gratis_por_canal': self.envio_gratis_por_canal(),
+        }
+
+
+def _agrupar_por_mes(unidades_por_dia):
+    meses = defaultdict(int)
+    for fecha, total in unidades_por_dia.items():
+        meses[f'{fecha.year:04d}-{fecha.month:02d}'] += total
+    return dict(sorted(meses.items()))
+
+
+def _resumen_canales(ventas, envios):
+    resultado = {}
+    for canal, nombre in CANALES.items():
+        resultado[nombre] = {
+            'ventas': ventas[canal],
+            'envio_gratis': envios[canal],
+            'proporcion': envios[canal] / ventas[canal] if ventas[canal] else 0.0,
+        }
+    return resultado
+
+
+def resumen_sql(ventas, desde=None):
+    # Mismo resumen que ReporteVentas.resumen(), pero con las sumas resueltas
+    # por la base de datos mediante GROUP BY; sólo viajan los totales. Igual
+    # que el reporte en columnas, ignora las ventas sin fila en una subtabla
+    # y cuenta como online las que figuran en ambas.
+    desde = desde or datetime.date.min
+    backend = ventas.backend
+    if not isinstance(backend, BackendSQL):
+        # Sin motor SQL no hay dónde delegar las sumas: se calculan en memoria.
+        reporte = ReporteVentas()
+        reporte.cargar_ventas(venta for venta in backend.iterar(ventas.tamano_pagina) if venta.fecha >= desde)
+        return reporte.resumen()
+
+    connection = backend.connect()
+    if not connection:
+        return None
+    try:
+        cursor = backend.cursor(connection)
+        filas = backend.consultar(cursor, '''
+            SELECT v.fecha, SUM(v.producto_vendido)
+            FROM Venta v
+            LEFT JOIN VentaOnline o ON o.dni = v.dni
+            LEFT JOIN VentaLocal l ON l.dni = v.dni
+            WHERE v.fecha >= %s AND (o.dni IS NOT NULL OR l.dni IS NOT NULL)
+            GROUP BY v.fecha
+        ''', (desde,))
+        unidades_por_dia = {_a_fecha(fecha): int(total) for fecha, total in filas}
+
+        (ventas_online, total_descuento), = backend.consultar(cursor, '''
+            SELECT COUNT(*), COALESCE(SUM(o.descuento_efectivo), 0)
+            FROM VentaOnline o
+            JOIN Venta v ON v.dni = o.dni
+            WHERE v.fecha >= %s
+        ''', (desde,))
+
+        (ventas_local, envios_local), = backend.consultar(cursor, '''
+            SELECT COUNT(*), COALESCE(SUM(l.envio_gratis), 0)
+            FROM VentaLocal l
+            JOIN Venta v ON v.dni = l.dni
+            LEFT JOIN VentaOnline o ON o.dni = l.dni
+            WHERE v.fecha >= %s AND o.dni IS NULL
+        ''', (desde,))
+    finally:
+        backend.liberar(connection)
+
+    return {
+        'ventas': int(ventas_online) + int(ventas_local),
+        'marca_agua': str(max(unidades_por_dia)) if unidades_por_dia else None,
+        'unidades_por_mes': _agrupar_por_mes(unidades_por_dia),
+        'total_descuento': float(total_descuento),
+        'envio_gratis_por_canal': _resumen_canales([int(ventas_online), int(ventas_local)], [0, int(envios_local)]),
+    }
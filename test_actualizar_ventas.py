@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from almacenamiento import BackendJSONL, BackendSQLite
+from clase import ProductosVendidos
+from metricas import Instrumentacion
+from modelos import VentaLocal, VentaOnline
+
+
+class ActualizarVentasSQLiteTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.backend = BackendSQLite(os.path.join(self.directorio.name, 'ventas.sqlite3'))
+        self.ventas = ProductosVendidos(backend=self.backend, metricas=Instrumentacion(habilitada=False))
+        self.ventas.crear_ventas([
+            VentaOnline(1000001, '2024-01-01', 'ana', 1),
+            VentaOnline(1000002, '2024-01-02', 'bruno', 5),
+            VentaLocal(1000003, '2024-01-03', 'carla', 1),
+            VentaLocal(1000004, '2024-01-04', 'dario', 5),
+        ])
+
+    def tearDown(self):
+        self.ventas.cerrar()
+        self.directorio.cleanup()
+
+    def fila(self, tabla, dni):
+        connection = self.backend.connect()
+        try:
+            return connection.execute(f'SELECT * FROM {tabla} WHERE dni = ?', (dni,)).fetchone()
+        finally:
+            self.backend.liberar(connection)
+
+    def test_producto_vendido_recalcula_derivados(self):
+        resultado = self.ventas.actualizar_ventas([
+            (1000001, {'producto_vendido': 4}),
+            (1000002, {'producto_vendido': 2}),
+            (1000003, {'producto_vendido': 3}),
+            (1000004, {'producto_vendido': 1}),
+        ])
+        self.assertEqual(resultado, {'actualizadas': 4, 'no_encontradas': [], 'errores': []})
+        self.assertAlmostEqual(self.fila('VentaOnline', 1000001)['descuento_efectivo'], 0.4)
+        self.assertEqual(self.fila('VentaOnline', 1000002)['descuento_efectivo'], 0)
+        self.assertEqual(self.fila('VentaLocal', 1000003)['envio_gratis'], 1)
+        self.assertEqual(self.fila('VentaLocal', 1000004)['envio_gratis'], 0)
+        for tabla, dni, cantidad in (('Venta', 1000001, 4), ('VentaOnline', 1000001, 4), ('VentaLocal', 1000004, 1)):
+            self.assertEqual(self.fila(tabla, dni)['producto_vendido'], cantidad)
+
+    def test_valor_explicito_prevalece_sobre_el_recalculo(self):
+        self.ventas.actualizar_ventas([
+            (1000001, {'producto_vendido': 6, 'descuento_efectivo': 9.5}),
+            (1000003, {'producto_vendido': 6, 'envio_gratis': False}),
+        ])
+        self.assertEqual(self.fila('VentaOnline', 1000001)['descuento_efectivo'], 9.5)
+        self.assertEqual(self.fila('VentaLocal', 1000003)['envio_gratis'], 0)
+        self.assertEqual(self.fila('VentaLocal', 1000003)['producto_vendido'], 6)
+
+    def test_campos_de_venta_se_copian_a_las_subtablas(self):
+        self.ventas.actualizar_ventas([
+            (1000002, {'cliente': 'Bruno Díaz', 'fecha': '2025-02-03'}),
+            (1000004, {'cliente': 'Darío'}),
+        ])
+        for tabla in ('Venta', 'VentaOnline'):
+            fila = self.fila(tabla, 1000002)
+            self.assertEqual((fila['cliente'], fila['fecha']), ('Bruno Díaz', '2025-02-03'))
+        self.assertEqual(self.fila('VentaLocal', 1000004)['cliente'], 'Darío')
+        self.assertEqual(self.fila('VentaLocal', 1000004)['fecha'], '2024-01-04')
+
+    def test_envio_gratis_en_texto(self):
+        for texto, esperado in (('False', 0), ('0', 0), ('sí', 1), ('no', 0)):
+            self.assertTrue(self.ventas.actualizar_venta(1000004, 'envio_gratis', texto))
+            self.assertEqual(self.fila('VentaLocal', 1000004)['envio_gratis'], esperado)
+        self.assertFalse(self.ventas.actualizar_venta(1000004, 'envio_gratis', 'quizás'))
+
+    def test_errores_y_ventas_inexistentes(self):
+        resultado = self.ventas.actualizar_ventas([
+            (1000001, {'fecha': 'mal'}),
+            (9999999, {'cliente': 'nadie'}),
+            (1000002, {'cliente': 'ok'}),
+        ])
+        self.assertEqual(resultado['actualizadas'], 1)
+        self.assertEqual(resultado['no_encontradas'], [9999999])
+        self.assertEqual([error['dni'] for error in resultado['errores']], [1000001])
+        self.assertEqual(self.fila('Venta', 1000001)['fecha'], '2024-01-01')
+
+    def test_jsonl_aplica_las_mismas_reglas(self):
+        backend = BackendJSONL(os.path.join(self.directorio.name, 'ventas.jsonl'))
+        ventas = ProductosVendidos(backend=backend, metricas=Instrumentacion(habilitada=False))
+        ventas.crear_ventas([VentaOnline(1000001, '2024-01-01', 'ana', 1), VentaLocal(1000003, '2024-01-03', 'carla', 1)])
+        ventas.actualizar_ventas([(1000001, {'producto_vendido': 4}), (1000003, {'producto_vendido': 6, 'envio_gratis': '0'})])
+        recargado = BackendJSONL(backend.ruta).obtener([1000001, 1000003])
+        self.assertAlmostEqual(recargado[1000001].descuento_efectivo, 0.4)
+        self.assertIs(recargado[1000003].envio_gratis, False)
+        self.assertEqual(recargado[1000003].producto_vendido, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from almacenamiento import BackendJSONL, BackendSQLite
+from clase import ProductosVendidos
+from metricas import Instrumentacion
+from modelos import VentaLocal, VentaOnline
+
+CLIENTES = [
+    'ana', 'Ana Maria', 'ANAHI', 'anabel', 'Bruno', 'bruno', 'Carla',
+    '50%_off', '50x_off', '50%xoff', '50_off', 'a!b', 'a!!b', 'ab', 'a%b',
+]
+
+
+def ventas_de_prueba():
+    ventas = []
+    for indice in range(45):
+        dni = 1000000 + (indice * 7919) % 1000
+        fecha = datetime.date(2024, 1, 1) + datetime.timedelta(days=indice % 6)
+        cliente = CLIENTES[indice % len(CLIENTES)]
+        if indice % 2:
+            ventas.append(VentaOnline(dni, str(fecha), cliente, indice % 4 + 1))
+        else:
+            ventas.append(VentaLocal(dni, str(fecha), cliente, indice % 4 + 1))
+    return ventas
+
+
+class BuscarVentasMixin:
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.ventas = ProductosVendidos(backend=self.crear_backend(self.directorio.name), metricas=Instrumentacion(habilitada=False))
+        self.addCleanup(self.ventas.cerrar)
+        self.todas = ventas_de_prueba()
+        self.ventas.crear_ventas(self.todas)
+
+    def paginar(self, limite, **filtros):
+        paginas = []
+        despues_de = None
+        while True:
+            resultado = self.ventas.buscar_ventas(limite=limite, despues_de=despues_de, **filtros)
+            paginas.append([venta.dni for venta in resultado['ventas']])
+            despues_de = resultado['siguiente']
+            if despues_de is None:
+                return paginas
+            self.assertLess(len(paginas), 100)
+
+    def esperado(self, cliente_prefijo=None, desde=None, hasta=None, tipo=None):
+        ventas = [
+            venta for venta in self.todas
+            if (cliente_prefijo is None or venta.cliente.lower().startswith(cliente_prefijo.lower()))
+            and (desde is None or str(venta.fecha) >= desde)
+            and (hasta is None or str(venta.fecha) <= hasta)
+            and (tipo is None or isinstance(venta, VentaOnline) == (tipo == 'online'))
+        ]
+        if cliente_prefijo:
+            ventas.sort(key=lambda venta: (venta.cliente.lower(), venta.dni))
+        elif desde or hasta:
+            ventas.sort(key=lambda venta: (venta.fecha, venta.dni))
+        else:
+            ventas.sort(key=lambda venta: venta.dni)
+        return [venta.dni for venta in ventas]
+
+    def comprobar(self, limite, **filtros):
+        paginas = self.paginar(limite, **filtros)
+        esperado = self.esperado(**filtros)
+        self.assertEqual([dni for pagina in paginas for dni in pagina], esperado)
+        self.assertTrue(all(len(pagina) == limite for pagina in paginas[:-1]))
+        self.assertTrue(esperado)
+        return paginas
+
+    def test_orden_por_dni(self):
+        self.comprobar(7)
+        self.comprobar(4, tipo='local')
+
+    def test_orden_por_fecha_con_empates(self):
+        self.comprobar(4, desde='2024-01-02')
+        self.comprobar(5, desde='2024-01-02', hasta='2024-01-04', tipo='online')
+        self.comprobar(3, hasta='2024-01-01')
+
+    def test_prefijo_sin_distinguir_mayusculas(self):
+        paginas = self.comprobar(2, cliente_prefijo='ANA')
+        clientes = {venta.cliente for venta in self.todas if venta.dni in paginas[0] + paginas[-1]}
+        self.assertTrue(clientes <= {'ana', 'Ana Maria', 'ANAHI', 'anabel'})
+        self.comprobar(3, cliente_prefijo='bru', desde='2024-01-03')
+
+    def test_comodines_en_el_prefijo(self):
+        for prefijo, clientes in (
+            ('50%', {'50%_off', '50%xoff'}),
+            ('50%_', {'50%_off'}),
+            ('50_', {'50_off'}),
+            ('a!', {'a!b', 'a!!b'}),
+            ('a!!', {'a!!b'}),
+            ('a%', {'a%b'}),
+        ):
+            paginas = self.comprobar(2, cliente_prefijo=prefijo)
+            encontrados = {venta.cliente for venta in self.todas if any(venta.dni in pagina for pagina in paginas)}
+            self.assertEqual(encontrados, clientes, prefijo)
+
+    def test_ultima_pagina_exacta(self):
+        total = len(self.esperado(tipo='online'))
+        paginas = self.paginar(total, tipo='online')
+        self.assertEqual(len(paginas), 1)
+        self.assertEqual(self.ventas.buscar_ventas(cliente_prefijo='zzz')['ventas'], [])
+
+    def test_cursor_sobrevive_a_modificaciones(self):
+        esperado = self.esperado(cliente_prefijo='ana')
+        primera = self.ventas.buscar_ventas(cliente_prefijo='ana', limite=3)
+        self.assertEqual([venta.dni for venta in primera['ventas']], esperado[:3])
+        self.ventas.actualizar_ventas([(esperado[2], {'cliente': 'zoe'})])
+        siguiente = self.ventas.buscar_ventas(cliente_prefijo='ana', limite=50, despues_de=primera['siguiente'])
+        self.assertEqual([venta.dni for venta in siguiente['ventas']], esperado[3:])
+
+    def test_parametros_invalidos(self):
+        with self.assertRaises(ValueError):
+            self.ventas.buscar_ventas(limite=0)
+        with self.assertRaises(ValueError):
+            self.ventas.buscar_ventas(tipo='mayorista')
+        with self.assertRaises(ValueError):
+            self.ventas.buscar_ventas(desde='01/02/2024')
+
+
+class BuscarVentasSQLiteTest(BuscarVentasMixin, unittest.TestCase):
+    def crear_backend(self, directorio):
+        return BackendSQLite(os.path.join(directorio, 'ventas.sqlite3'))
+
+    def test_usa_los_indices(self):
+        backend = self.ventas.backend
+        connection = backend.connect()
+        try:
+            for condicion, indice in (("v.cliente COLLATE NOCASE LIKE 'ana%' ESCAPE '!'", 'idx_venta_cliente'), ("v.fecha >= '2024-01-02'", 'idx_venta_fecha')):
+                plan = connection.execute(f'EXPLAIN QUERY PLAN SELECT v.dni FROM Venta v WHERE {condicion}').fetchall()
+                self.assertIn(indice, ' '.join(fila[3] for fila in plan))
+        finally:
+            backend.liberar(connection)
+
+
+class BuscarVentasJSONLTest(BuscarVentasMixin, unittest.TestCase):
+    def crear_backend(self, directorio):
+        return BackendJSONL(os.path.join(directorio, 'ventas.jsonl'))
+
+    def test_indices_se_mantienen_y_se_recargan(self):
+        self.comprobar(4, cliente_prefijo='b')
+        self.ventas.actualizar_ventas([(self.todas[0].dni, {'cliente': 'bruna', 'fecha': '2024-02-01'})])
+        self.ventas.eliminar_venta(self.todas[1].dni)
+        self.todas = list(BackendJSONL(self.ventas.backend.ruta).iterar(None))
+        self.comprobar(4, cliente_prefijo='b')
+        self.comprobar(4, desde='2024-01-03')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from almacenamiento import BackendSQLite
+from cache_ventas import CacheVentas
+from clase import ProductosVendidos
+from metricas import Instrumentacion
+from modelos import VentaLocal, VentaOnline
+
+
+def venta(dni):
+    return VentaOnline(dni, '2024-01-01', f'cliente {dni}', 1)
+
+
+class CacheVentasTest(unittest.TestCase):
+    def setUp(self):
+        self.ahora = 1000.0
+        reloj = mock.patch('cache_ventas.time.monotonic', side_effect=lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+        self.cache = CacheVentas(tamano_maximo=3, ttl=10)
+
+    def test_aciertos_y_fallos(self):
+        self.cache.guardar(venta(1000001))
+        self.assertEqual(self.cache.obtener(1000001).dni, 1000001)
+        self.assertEqual(self.cache.obtener('1000001').dni, 1000001)
+        self.assertIsNone(self.cache.obtener(1000002))
+        self.assertIsNone(self.cache.obtener('no es un dni'))
+        estadisticas = self.cache.estadisticas()
+        self.assertEqual((estadisticas['aciertos'], estadisticas['fallos']), (2, 2))
+        self.assertEqual(estadisticas['tasa_aciertos'], 0.5)
+
+    def test_desaloja_la_menos_usada(self):
+        for dni in (1000001, 1000002, 1000003):
+            self.cache.guardar(venta(dni))
+        self.cache.obtener(1000001)
+        self.cache.guardar(venta(1000004))
+        self.assertIsNone(self.cache.obtener(1000002))
+        self.assertEqual([dni for dni in (1000001, 1000003, 1000004) if self.cache.obtener(dni)], [1000001, 1000003, 1000004])
+        self.assertEqual(len(self.cache), 3)
+        self.assertEqual(self.cache.estadisticas()['desalojos'], 1)
+
+    def test_guardar_de_nuevo_renueva_la_entrada(self):
+        for dni in (1000001, 1000002, 1000003):
+            self.cache.guardar(venta(dni))
+        self.ahora += 8
+        self.cache.guardar(venta(1000001))
+        self.cache.guardar(venta(1000004))
+        self.assertFalse(self.cache.contiene(1000002))
+        self.ahora += 5
+        self.assertEqual(self.cache.obtener(1000001).dni, 1000001)
+        self.assertIsNone(self.cache.obtener(1000003))
+
+    def test_ttl(self):
+        self.cache.guardar(venta(1000001))
+        self.ahora += 9.9
+        self.assertIsNotNone(self.cache.obtener(1000001))
+        self.ahora += 0.1
+        self.assertIsNone(self.cache.obtener(1000001))
+        self.assertEqual(len(self.cache), 0)
+        estadisticas = self.cache.estadisticas()
+        self.assertEqual((estadisticas['expiradas'], estadisticas['fallos']), (1, 1))
+
+    def test_invalidar(self):
+        self.cache.guardar(venta(1000001))
+        self.cache.invalidar(1000001)
+        self.cache.invalidar(1000002)
+        self.assertIsNone(self.cache.obtener(1000001))
+        self.assertEqual(self.cache.estadisticas()['invalidaciones'], 1)
+
+    def test_contiene_no_altera_estadisticas_ni_orden(self):
+        for dni in (1000001, 1000002, 1000003):
+            self.cache.guardar(venta(dni))
+        self.assertTrue(self.cache.contiene(1000001))
+        self.assertFalse(self.cache.contiene(1000009))
+        self.cache.guardar(venta(1000004))
+        self.assertFalse(self.cache.contiene(1000001))
+        self.ahora += 10
+        self.assertFalse(self.cache.contiene(1000004))
+        estadisticas = self.cache.estadisticas()
+        self.assertEqual((estadisticas['aciertos'], estadisticas['fallos'], estadisticas['expiradas']), (0, 0, 0))
+
+
+class CacheProductosVendidosTest(unittest.TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        backend = BackendSQLite(os.path.join(self.directorio.name, 'ventas.sqlite3'))
+        self.ventas = ProductosVendidos(backend=backend, metricas=Instrumentacion(habilitada=False))
+        self.addCleanup(self.ventas.cerrar)
+        self.ventas.cache = CacheVentas(tamano_maximo=10, ttl=300)
+
+    def test_lecturas_repetidas_salen_de_la_cache(self):
+        self.ventas.crear_ventas([venta(1000000 + i) for i in range(50)])
+        self.assertEqual(self.ventas.leer_venta(1000001).dni, 1000001)
+        self.assertEqual(self.ventas.leer_venta(1000001).dni, 1000001)
+        self.ventas.crear_venta(venta(1000001))
+        self.ventas.actualizar_ventas([(1000002, {'cliente': 'otro'})])
+        estadisticas = self.ventas.estadisticas_cache()
+        self.assertEqual((estadisticas['aciertos'], estadisticas['fallos']), (1, 1))
+
+    def test_las_escrituras_invalidan(self):
+        self.ventas.crear_ventas([VentaLocal(1000001, '2024-01-01', 'ana', 1)])
+        self.ventas.leer_venta(1000001)
+        self.assertTrue(self.ventas.actualizar_venta(1000001, 'cliente', 'Ana'))
+        self.assertEqual(self.ventas.leer_venta(1000001).cliente, 'Ana')
+        self.assertTrue(self.ventas.eliminar_venta(1000001))
+        self.assertIsNone(self.ventas.leer_venta(1000001))
+
+
+if __name__ == '__main__':
+    unittest.main()